@@ -1,20 +1,37 @@
-from flask import Flask, render_template, send_file, request, jsonify, url_for
+from flask import Flask, Response, render_template, send_file, request, jsonify, url_for
 import os
+import threading
+import uuid
 from md_to_image import convert_md_to_image
 import glob
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import subprocess
 import sys
 from llm_analyzer import LLMAnalyzer
+from raw_data import raw_file_for_report
+from ranking import build_time_ranges
 from dotenv import load_dotenv
 import re
+from collections import OrderedDict
 
 # 加载 .env 文件
 load_dotenv()
 
 app = Flask(__name__)
 
+# SSE连接空闲多久发送一次心跳(秒)
+SSE_HEARTBEAT_SECONDS = 15
+
+# 采集和生成会写同一批原始数据和报告文件，同一时间只允许一个生成任务
+generation_lock = threading.Lock()
+BUSY_MESSAGE = '已有报告正在生成，请稍后再试'
+
+# 保留最近的后台任务，供页面订阅进度
+MAX_JOBS = 20
+jobs = OrderedDict()
+jobs_lock = threading.Lock()
+
 # 创建 LLMAnalyzer 实例，使用环境变量
 llm_analyzer = LLMAnalyzer(
     api_key=os.getenv('LLM_API_KEY'),
@@ -228,57 +245,126 @@ def regenerate(filename):
         print(f"重新生成错误: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def resolve_md_request(filename):
+    """校验要重新生成的MD文件路径，返回(安全路径, 原始数据文件, 错误响应)"""
+    # 确保文件路径安全
+    safe_path = os.path.normpath(filename)
+    if not safe_path.startswith('reports'):
+        return None, None, (jsonify({"error": "Invalid file path"}), 400)
+
+    # 从 MD 文件路径中找到对应的原始数据文件
+    raw_data_file = raw_file_for_report(safe_path)
+
+    print(f"Looking for raw data file: {raw_data_file}")
+
+    if not os.path.exists(raw_data_file):
+        return None, None, (jsonify({"error": f"Raw data file not found: {raw_data_file}"}), 404)
+    return safe_path, raw_data_file, None
+
+def run_regenerate_md(safe_path, raw_data_file, force=False, on_event=None):
+    """重新生成MD文件和预览图片，返回结果字典"""
+    # 从 main.py 导入必要的组件
+    from main import llm_analyzer, translator
+
+    # 获取时间范围，与 main.py 中保持一致
+    time_ranges = build_time_ranges(datetime.utcnow())
+
+    success = llm_analyzer.generate_report(raw_data_file, safe_path, time_ranges, translator,
+                                           force=force, on_event=on_event)
+    if not success:
+        return {'success': False, 'message': '报告重新生成失败'}
+
+    # 生成预览图片
+    if on_event:
+        on_event("stage", "生成预览图片")
+    dir_path = os.path.dirname(safe_path)
+    base_name = os.path.basename(safe_path)
+    preview_filename = os.path.splitext(base_name)[0] + '.png'
+    preview_path = os.path.join(dir_path, preview_filename)
+    convert_md_to_image(safe_path, preview_path, width=600)
+    return {'success': True, 'message': '报告重新生成成功', 'report_path': safe_path.replace('\\', '/')}
+
+class GenerationJob:
+    """后台生成任务
+
+    记录任务产生的全部进度事件({"type": stage/section/token/done/error, ...})，
+    订阅者从第一个事件开始回放，再等待新事件，断线重连或晚到的页面也能看到完整内容。
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.events = []
+        self.finished = False
+        self._condition = threading.Condition()
+
+    def emit(self, event):
+        with self._condition:
+            self.events.append(event)
+            if event["type"] in ("done", "error"):
+                self.finished = True
+            self._condition.notify_all()
+
+    def wait(self, index, timeout):
+        """返回第index个及之后的事件，暂时没有新事件时最多等待timeout秒"""
+        with self._condition:
+            if len(self.events) <= index and not self.finished:
+                self._condition.wait(timeout)
+            return self.events[index:]
+
+def start_job(task):
+    """在后台线程执行task(on_event)，返回任务；已有报告正在生成时返回None
+
+    task返回的结果字典以type为done的事件记录，出错时记录type为error的事件。
+    浏览器断开后任务继续执行，报告照常写入文件。
+    """
+    if not generation_lock.acquire(blocking=False):
+        return None
+    job = GenerationJob()
+    with jobs_lock:
+        jobs[job.id] = job
+        while len(jobs) > MAX_JOBS:
+            jobs.popitem(last=False)
+
+    def run():
+        try:
+            result = task(lambda event_type, content: job.emit({"type": event_type, "content": content}))
+            job.emit(dict(result, type="done"))
+        except Exception as e:
+            print(f"后台生成错误: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            job.emit({"type": "error", "content": str(e)})
+        finally:
+            generation_lock.release()
+
+    threading.Thread(target=run, daemon=True).start()
+    return job
+
+def job_response(job):
+    if job is None:
+        return jsonify({"error": BUSY_MESSAGE}), 409
+    return jsonify({"job_id": job.id, "events_url": url_for('job_events', job_id=job.id)})
+
+def run_exclusive(task):
+    """同步执行task并返回JSON结果；已有报告正在生成时返回409"""
+    if not generation_lock.acquire(blocking=False):
+        return jsonify({"error": BUSY_MESSAGE}), 409
+    try:
+        return jsonify(task())
+    finally:
+        generation_lock.release()
+
 @app.route('/regenerate-md/<path:filename>')
 def regenerate_md(filename):
     """使用大模型重新生成MD文件"""
     try:
-        # 确保文件路径安全
-        safe_path = os.path.normpath(filename)
-        if not safe_path.startswith('reports'):
-            return jsonify({"error": "Invalid file path"}), 400
+        safe_path, raw_data_file, error = resolve_md_request(filename)
+        if error:
+            return error
 
-        # 从 main.py 导入必要的组件
-        from main import llm_analyzer, translator
-            
-        # 获取所在的日期目录和文件名
-        dir_path = os.path.dirname(safe_path)
-        
-        # 从 MD 文件路径中找到对应的原始数据文件
-        raw_data_file = safe_path.replace('_report', '_raw').replace('.md', '.txt')
-        
-        print(f"Looking for raw data file: {raw_data_file}")
-        
-        if not os.path.exists(raw_data_file):
-            return jsonify({"error": f"Raw data file not found: {raw_data_file}"}), 404
-            
-        # 获取时间范围，与 main.py 中保持一致
-        now = datetime.utcnow()
-        time_ranges = {
-            "24h": now - timedelta(hours=24),
-            "week": now - timedelta(days=7),
-            "month": now - timedelta(days=30)
-        }
-        
-        # 调用 generate_report 函数重新生成报告
-        success = llm_analyzer.generate_report(raw_data_file, safe_path, time_ranges, translator)
-        
-        if success:
-            # 生成预览图片
-            base_name = os.path.basename(safe_path)
-            preview_filename = os.path.splitext(base_name)[0] + '.png'
-            preview_path = os.path.join(dir_path, preview_filename)
-            
-            convert_md_to_image(safe_path, preview_path, width=600)
-            
-            return jsonify({
-                'success': True,
-                'message': '报告重新生成成功'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': '报告重新生成失败'
-            })
+        # 调用 generate_report 函数重新生成报告；?force=true 时跳过大模型响应缓存
+        force = request.args.get('force', 'false').lower() == 'true'
+        return run_exclusive(lambda: run_regenerate_md(safe_path, raw_data_file, force))
             
     except Exception as e:
         print(f"重新生成MD错误: {str(e)}")
@@ -286,6 +372,43 @@ def regenerate_md(filename):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/jobs/regenerate-md/<path:filename>', methods=['POST'])
+def start_regenerate_md(filename):
+    """在后台重新生成MD文件，返回任务id，进度通过 /jobs/<job_id>/events 订阅"""
+    safe_path, raw_data_file, error = resolve_md_request(filename)
+    if error:
+        return error
+    force = request.args.get('force', 'false').lower() == 'true'
+    return job_response(start_job(lambda on_event: run_regenerate_md(safe_path, raw_data_file, force, on_event)))
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """以SSE(text/event-stream)推送任务的进度事件，页面边生成边显示
+
+    先回放已有的事件，再推送新事件，任务结束后关闭连接。
+    """
+    with jobs_lock:
+        job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        index = 0
+        while True:
+            events = job.wait(index, SSE_HEARTBEAT_SECONDS)
+            if not events:
+                if job.finished:
+                    break
+                # 注释行作为心跳，防止代理在等待模型时断开空闲连接
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            index += len(events)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/regenerate-all')
 def regenerate_all():
     try:
@@ -349,43 +472,34 @@ def generate_report():
 def reports_files(filename):
     return send_file(os.path.join('reports', filename))
 
+def run_generate_today(on_event=None):
+    """采集数据并生成当天的完整报告，返回结果字典"""
+    # 导入 main 函数
+    from main import main,move_to_lastest
+
+    # 执行 main 函数
+    success = main(on_event)
+    move_to_lastest()
+
+    if not success:
+        return {'success': False, 'message': '今日报告生成失败'}
+
+    # 获取当前日期
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    date_dir = os.path.join("reports", current_date)
+
+    # 查找新生成的报告文件
+    report_file = os.path.join(date_dir, f"reddit_report_{current_date}.md")
+    if os.path.exists(report_file):
+        return {'success': True, 'message': '今日报告生成成功', 'report_path': report_file.replace('\\', '/')}
+
+    return {'success': True, 'message': '今日报告生成成功，但文件未找到'}
+
 @app.route('/generate-today', methods=['POST'])
 def generate_today():
     """生成当天的完整报告"""
     try:
-        # 导入 main 函数
-        from main import main,move_to_lastest
-        
-        # 执行 main 函数
-        success = main()
-        move_to_lastest()
-        
-        if success:
-            # 获取当前日期
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            date_dir = os.path.join("reports", current_date)
-            
-            if os.path.exists(date_dir):
-                # 查找新生成的报告文件
-                report_file = os.path.join(date_dir, f"reddit_report_{current_date}.md")
-                preview_file = os.path.join(date_dir, f"reddit_report_{current_date}.png")
-                
-                if os.path.exists(report_file):
-                    return jsonify({
-                        'success': True,
-                        'message': '今日报告生成成功',
-                        'report_path': report_file
-                    })
-            
-            return jsonify({
-                'success': True,
-                'message': '今日报告生成成功，但文件未找到'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': '今日报告生成失败'
-            })
+        return run_exclusive(run_generate_today)
     
     except Exception as e:
         print(f"生成今日报告错误: {str(e)}")
@@ -393,6 +507,11 @@ def generate_today():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/jobs/generate-today', methods=['POST'])
+def start_generate_today():
+    """在后台生成当天的完整报告，返回任务id，采集进度和分析内容通过 /jobs/<job_id>/events 订阅"""
+    return job_response(start_job(run_generate_today))
+
 @app.route('/refresh')
 def refresh():
     """强制刷新文件列表"""
@@ -0,0 +1,191 @@
+"""离线基准测试
+
+先用录制模式正常跑一次，保存Reddit的原始响应：
+    REDDIT_TRANSPORT=record python main.py
+之后即可在无网络环境下重复测量采集阶段：
+    python benchmark.py fetch --runs 3 --latency 0.2
+
+翻译阶段使用本地模拟翻译服务和合成的一天数据，不调用付费接口：
+    python benchmark.py translate --posts 300 --latency 0.05 --qps 50
+"""
+import argparse
+import datetime
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+def bench_fetch(args):
+    """回放录制的响应，测量采集阶段的耗时和请求数"""
+    os.environ["REDDIT_TRANSPORT"] = "replay"
+    os.environ["REDDIT_CASSETTE_DIR"] = args.cassette_dir
+    os.environ["REDDIT_REPLAY_LATENCY"] = str(args.latency)
+    os.environ["REDDIT_MAX_WORKERS"] = str(args.workers)
+    os.environ["REDDIT_REFRESH_KNOWN"] = "false"
+
+    from reddit_transport import recorded_at
+    recorded = recorded_at(args.cassette_dir)
+    if recorded is None:
+        print(f"{args.cassette_dir} 中没有录制数据，请先以 REDDIT_TRANSPORT=record 运行 main.py")
+        return
+    # 以录制时间为基准，保证每次回放请求的列表完全一致
+    now = datetime.datetime.utcfromtimestamp(recorded)
+
+    import main
+    from post_store import PostStore
+    from ranking import build_time_ranges
+    subreddits = main.reddit_client.load_subreddits()
+    time_ranges = build_time_ranges(now)
+
+    durations = []
+    for i in range(args.runs):
+        # 每轮使用空的帖子存储，避免上一轮的评论缓存影响结果
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            main.reddit_client.post_store = PostStore(os.path.join(tmp_dir, "post_store.db"))
+            requests_before = main.transport_stats.requests
+            start = time.perf_counter()
+            count = main.collect_posts(subreddits, time_ranges, lambda name, posts: None, now)
+            duration = time.perf_counter() - start
+            main.reddit_client.post_store.close()
+        durations.append(duration)
+        print(f"第{i + 1}轮: {duration:.2f}秒, {count} 条帖子, "
+              f"{main.transport_stats.requests - requests_before} 次请求")
+
+    print(f"采集阶段耗时: 中位数 {statistics.median(durations):.2f}秒, "
+          f"最短 {min(durations):.2f}秒, 最长 {max(durations):.2f}秒")
+    if main.transport_stats.misses:
+        print(f"警告: {main.transport_stats.misses} 次请求没有录制的响应")
+
+SYNTHETIC_WORDS = ("model", "training", "GPU", "inference", "benchmark", "release", "open", "source",
+                   "weights", "context", "tokens", "fine-tune", "quantized", "latency", "dataset",
+                   "agent", "prompt", "memory", "cluster", "paper", "results", "local", "server")
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + rng.choice((".", "!", "?"))
+
+def write_synthetic_day(path: str, subreddits, posts_per_subreddit: int, now: datetime.datetime, seed: int = 0):
+    """生成合成的一天原始数据：发布时间分布在最近一个月内，部分帖子正文超过单条翻译长度限制"""
+    from raw_data import RawDataWriter
+    rng = random.Random(seed)
+    writer = RawDataWriter(path)
+    writer.start(subreddits, now, resume=False)
+    for name in subreddits:
+        posts = []
+        for i in range(posts_per_subreddit):
+            paragraphs = rng.choice((1, 1, 2, 4, 8))
+            posts.append({
+                "id": f"{name[:3].lower()}{i:05d}",
+                "title": _sentence(rng, rng.randint(5, 15)),
+                "author": f"user{rng.randint(1, 5000)}",
+                "created": (now - datetime.timedelta(hours=rng.uniform(0, 24 * 30))).strftime("%Y-%m-%d %H:%M"),
+                "score": int(rng.paretovariate(1.2) * 20),
+                "comment_count": int(rng.paretovariate(1.2) * 10),
+                "content": "\n\n".join(" ".join(_sentence(rng, rng.randint(8, 20)) for _ in range(6))
+                                        for _ in range(paragraphs)),
+                "flair": rng.choice((None, "Discussion", "News", "Question")),
+                "comments": [f"user{rng.randint(1, 5000)}: {_sentence(rng, rng.randint(5, 40))}"
+                             for _ in range(rng.randint(0, 20))],
+                "url": f"https://reddit.com/r/{name}/comments/{i}/",
+                "subreddit": name
+            })
+        writer.write_subreddit(name, posts)
+    writer.finish()
+
+def bench_translate(args):
+    """用本地模拟翻译服务测量表格翻译和JS导出两个阶段"""
+    from translation_backend import LocalBackend, LocalTranslationServer
+    from translation_cache import TranslationCache
+    from translation_utils import TranslationUtils
+    from json_converter import convert_to_js
+    from llm_analyzer import LLMAnalyzer
+    from llm_cache import LLMCache
+    from summary_store import SummaryStore
+    from ranking import build_time_ranges
+    from raw_data import load_posts
+    os.environ["TRANSLATION_ENABLED"] = "true"
+
+    class CountingTranslator(TranslationUtils):
+        """统计调用方请求翻译的字符串数"""
+        requested = 0
+
+        def translate_many(self, texts):
+            self.requested += len(texts)
+            return super().translate_many(texts)
+
+    now = datetime.datetime.utcnow()
+    time_ranges = build_time_ranges(now)
+    subreddits = [f"Synthetic{i}" for i in range(args.subreddits)]
+    server = LocalTranslationServer(latency=args.latency, qps=args.qps)
+    server.start()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        analyzer = LLMAnalyzer(api_key="benchmark", model_name="benchmark", base_url=server.url,
+                               cache=LLMCache(os.path.join(tmp_dir, "llm_cache.db")),
+                               summary_store=SummaryStore(os.path.join(tmp_dir, "summary_store.db")))
+        raw_file = os.path.join(tmp_dir, "reddit_raw_synthetic.jsonl")
+        write_synthetic_day(raw_file, subreddits, args.posts, now)
+        # 各轮共享同一个缓存，第一轮为冷缓存，之后的轮次体现跨天复用的效果
+        cache = TranslationCache(os.path.join(tmp_dir, "translation_cache.db"))
+        stages = (
+            ("表格", lambda t: analyzer._generate_tables(load_posts(raw_file), time_ranges, t)),
+            ("JS导出", lambda t: convert_to_js(raw_file, os.path.join(tmp_dir, "out.js"), t)),
+        )
+
+        for i in range(args.runs):
+            report_calls = 0
+            for name, stage in stages:
+                translator = CountingTranslator("benchmark", "benchmark", cache=cache,
+                                                backend=LocalBackend(server.url))
+                server.reset_stats()
+                hits, misses = cache.hits, cache.misses
+                start = time.perf_counter()
+                stage(translator)
+                duration = time.perf_counter() - start
+                translator.close()
+                lookups = cache.hits - hits + cache.misses - misses
+                hit_rate = (cache.hits - hits) / lookups if lookups else 0.0
+                report_calls += server.calls
+                print(f"第{i + 1}轮 {name}: {duration:.2f}秒, {translator.requested} 条字符串 "
+                      f"({translator.requested / duration if duration else 0:.0f} 条/秒), "
+                      f"{server.calls} 次调用(批量 {server.batch_calls}), 限流 {server.throttled} 次, "
+                      f"缓存命中率 {hit_rate:.1%}")
+            print(f"第{i + 1}轮 每份报告 {report_calls} 次翻译调用")
+        cache.close()
+        analyzer.cache.close()
+    server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Reddit日报流水线离线基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fetch_parser = subparsers.add_parser("fetch", help="回放录制的Reddit响应，测量采集阶段")
+    fetch_parser.add_argument("--cassette-dir", default="cassettes", help="录制文件目录")
+    fetch_parser.add_argument("--runs", type=int, default=3, help="重复次数")
+    fetch_parser.add_argument("--latency", type=float, default=0.0, help="每次请求的模拟延迟(秒)")
+    fetch_parser.add_argument("--workers", type=int, default=4, help="并发线程数")
+    fetch_parser.set_defaults(func=bench_fetch)
+
+    translate_parser = subparsers.add_parser("translate", help="用本地模拟翻译服务测量翻译阶段")
+    translate_parser.add_argument("--subreddits", type=int, default=10, help="合成数据的subreddit数")
+    translate_parser.add_argument("--posts", type=int, default=30, help="每个subreddit的帖子数")
+    translate_parser.add_argument("--runs", type=int, default=2, help="重复次数(第一轮为冷缓存)")
+    translate_parser.add_argument("--latency", type=float, default=0.05, help="每次调用的模拟延迟(秒)")
+    translate_parser.add_argument("--qps", type=int, default=50, help="模拟服务每秒允许的调用数，0表示不限流")
+    translate_parser.set_defaults(func=bench_translate)
+
+    args = parser.parse_args()
+    # 先于main、json_converter配置日志，它们的basicConfig不再生效，不会清空生产日志
+    logging.basicConfig(
+        filename="benchmark.log",
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        filemode="w",
+        encoding="utf-8"
+    )
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
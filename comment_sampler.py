@@ -0,0 +1,62 @@
+import heapq
+import itertools
+from typing import List
+import praw
+
+class CommentSampler:
+    """按评分抽取评论树中的热门评论
+
+    惰性地深度优先遍历评论树，不展开成完整列表；用大小为k的最小堆保留评分最高的评论，
+    每个帖子的开销只取决于遍历深度和k。
+
+    Args:
+        k: 最多保留的评论数
+        max_depth: 最大遍历深度，1表示只看顶层评论
+        max_length: 单条评论保留的最大字符数
+        char_budget: 所有评论合计的最大字符数
+    """
+
+    def __init__(self, k: int = 20, max_depth: int = 3, max_length: int = 300, char_budget: int = 4000):
+        self.k = k
+        self.max_depth = max_depth
+        self.max_length = max_length
+        self.char_budget = char_budget
+
+    def _walk(self, forest):
+        """逐条产出(评论, 深度)，跳过未展开的MoreComments"""
+        stack = [(iter(forest), 1)]
+        while stack:
+            iterator, depth = stack[-1]
+            comment = next(iterator, None)
+            if comment is None:
+                stack.pop()
+                continue
+            if not isinstance(comment, praw.models.Comment):
+                continue
+            yield comment
+            if depth < self.max_depth:
+                stack.append((iter(comment.replies), depth + 1))
+
+    def sample(self, forest) -> List[str]:
+        """返回按评分降序排列的评论，格式为"作者: 内容" """
+        heap = []
+        counter = itertools.count()
+        for comment in self._walk(forest):
+            if comment.body in ("[deleted]", "[removed]"):
+                continue
+            # 评分相同时保留先遍历到的评论
+            item = (comment.score, -next(counter), comment)
+            if len(heap) < self.k:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+
+        comments = []
+        used = 0
+        for _, _, comment in sorted(heap, key=lambda x: x[:2], reverse=True):
+            text = f"{getattr(comment.author, 'name', '[已删除]')}: {comment.body[:self.max_length]}"
+            if used + len(text) > self.char_budget:
+                break
+            comments.append(text)
+            used += len(text)
+        return comments
@@ -0,0 +1,135 @@
+import hashlib
+import re
+import struct
+import logging
+from collections import defaultdict
+from typing import Dict, List, Set
+
+# MinHash签名长度 = 分段数 × 每段行数；相似度0.7的帖子落入同一个桶的概率约99.9%
+NUM_BANDS = 16
+ROWS_PER_BAND = 3
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+
+# 候选对的Jaccard相似度达到该值才视为重复
+SIMILARITY_THRESHOLD = 0.7
+
+# 参与比较的正文字符数，标题总是完整参与
+CONTENT_PREFIX = 300
+
+# 词级shingle的长度
+SHINGLE_SIZE = 3
+
+# 参与近似匹配的最少shingle数。"Daily Questions"、"Weekly Discussion Thread"这类短标题的
+# 模板帖只有一两个shingle，彼此的相似度总是1.0，只能按链接精确匹配
+MIN_SHINGLES = 5
+
+# 每次blake2b摘要提供16个32位哈希值，用不同的salt得到足够的独立哈希函数
+_HASHES_PER_DIGEST = 16
+_SALTS = [f"minhash{i}".encode() for i in range(-(-NUM_PERM // _HASHES_PER_DIGEST))]
+_UNPACK = struct.Struct(f"<{_HASHES_PER_DIGEST}I").unpack
+
+logger = logging.getLogger(__name__)
+
+def shingles(post: Dict) -> Set[str]:
+    """标题和正文开头的词级shingle集合"""
+    text = f"{post.get('title', '')} {(post.get('content') or '')[:CONTENT_PREFIX]}"
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def minhash(shingle_set: Set[str]) -> List[int]:
+    """计算MinHash签名：每个shingle得到NUM_PERM个独立哈希值，签名取各位置的最小值"""
+    rows = []
+    for shingle in shingle_set:
+        data = shingle.encode("utf-8")
+        row = ()
+        for salt in _SALTS:
+            row += _UNPACK(hashlib.blake2b(data, digest_size=64, salt=salt).digest())
+        rows.append(row[:NUM_PERM])
+    return [min(column) for column in zip(*rows)]
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def find_duplicate_groups(posts: List[Dict], threshold: float = SIMILARITY_THRESHOLD) -> List[List[int]]:
+    """用MinHash/LSH找出近似重复的帖子，返回各重复组的下标(组内至少两个帖子)
+
+    签名按段分桶，同一个桶里的帖子成为候选对，再用精确的Jaccard相似度确认，
+    避免两两比较全部帖子。shingle少于MIN_SHINGLES的帖子不做近似匹配，
+    只和链接完全相同的帖子合并。
+    """
+    shingle_sets = [shingles(p) for p in posts]
+    buckets = defaultdict(list)
+    by_url = defaultdict(list)
+    for i, shingle_set in enumerate(shingle_sets):
+        if posts[i].get("url"):
+            by_url[posts[i]["url"]].append(i)
+        if len(shingle_set) < MIN_SHINGLES:
+            continue
+        signature = minhash(shingle_set)
+        for band in range(NUM_BANDS):
+            buckets[(band, tuple(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]))].append(i)
+
+    # 并查集合并确认重复的帖子
+    parent = list(range(len(posts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for members in by_url.values():
+        for i in members[1:]:
+            parent[find(i)] = find(members[0])
+
+    checked = set()
+    for members in buckets.values():
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                i, j = members[x], members[y]
+                if (i, j) in checked or find(i) == find(j):
+                    continue
+                checked.add((i, j))
+                if jaccard(shingle_sets[i], shingle_sets[j]) >= threshold:
+                    parent[find(j)] = find(i)
+
+    groups = defaultdict(list)
+    for i in range(len(posts)):
+        groups[find(i)].append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+def merge_group(posts: List[Dict]) -> Dict:
+    """把一组重复帖子合并为一条：保留评分最高的帖子，评分和评论数累加，评论去重合并
+
+    链接相同的是同一个帖子的多份记录，只按评分最高的一份计入。
+    """
+    ordered = sorted(posts, key=lambda p: p.get("score", 0), reverse=True)
+    distinct = list({p.get("url") or id(p): p for p in reversed(ordered)}.values())
+    merged = dict(ordered[0])
+    merged["score"] = sum(p.get("score", 0) for p in distinct)
+    merged["comment_count"] = sum(p.get("comment_count", 0) for p in distinct)
+    merged["comments"] = list(dict.fromkeys(c for p in ordered for c in p.get("comments", [])))
+    return merged
+
+def dedupe_posts(posts: List, threshold: float = SIMILARITY_THRESHOLD) -> List:
+    """合并跨subreddit转发和近似重复的帖子
+
+    每个重复组在评分最高的帖子的位置放入合并后的字典，组内其余帖子去掉；
+    不重复的帖子保持原顺序和原对象。
+    """
+    groups = find_duplicate_groups(posts, threshold)
+    if not groups:
+        return list(posts)
+    replaced = {}
+    dropped = set()
+    for members in groups:
+        canonical = max(members, key=lambda i: posts[i].get("score", 0))
+        group = [posts[i].to_dict() if hasattr(posts[i], "to_dict") else posts[i] for i in members]
+        replaced[canonical] = merge_group(group)
+        dropped.update(i for i in members if i != canonical)
+    logger.info(f"合并了 {len(groups)} 组重复帖子，去掉 {len(dropped)} 条")
+    return [replaced.get(i, post) for i, post in enumerate(posts) if i not in dropped]
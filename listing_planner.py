@@ -0,0 +1,77 @@
+import datetime
+import math
+from typing import List, Dict, Optional
+
+# Reddit列表接口每页最多返回100条
+PAGE_SIZE = 100
+
+# Reddit top列表支持的时间过滤器及其覆盖的时长
+TIME_FILTERS = [
+    ("hour", datetime.timedelta(hours=1)),
+    ("day", datetime.timedelta(days=1)),
+    ("week", datetime.timedelta(days=7)),
+    ("month", datetime.timedelta(days=31)),
+    ("year", datetime.timedelta(days=366)),
+]
+
+# 时间范围的起点与当前时间之间允许的误差：调用方未传入本次运行的now时，
+# 构建time_ranges和规划列表之间经过的时间不应让24小时范围落到week过滤器
+TIME_FILTER_TOLERANCE = datetime.timedelta(hours=1)
+
+class ListingSpec:
+    """一次列表拉取的计划
+
+    Args:
+        window: 对应的时间范围(time_ranges中的键)
+        kind: 列表类型，"new"或"top"
+        limit: 最多拉取的帖子数
+        cutoff: 时间范围的起始时间，早于该时间的帖子不需要
+        time_filter: top列表的时间过滤器
+        fallback: new列表在页数预算内没有翻到cutoff时改用的计划
+    """
+
+    def __init__(self, window: str, kind: str, limit: int, cutoff: datetime.datetime,
+                 time_filter: str = None, fallback: "ListingSpec" = None):
+        self.window = window
+        self.kind = kind
+        self.limit = limit
+        self.cutoff = cutoff
+        self.time_filter = time_filter
+        self.fallback = fallback
+
+    @property
+    def requests(self) -> int:
+        """该计划最多消耗的请求数"""
+        return math.ceil(self.limit / PAGE_SIZE)
+
+    def __repr__(self):
+        if self.kind == "top":
+            return f"top(time_filter={self.time_filter}, limit={self.limit})"
+        return f"new(limit={self.limit})"
+
+def time_filter_for(span: datetime.timedelta) -> Optional[str]:
+    """返回能覆盖span的最小top时间过滤器(允许TIME_FILTER_TOLERANCE的误差)"""
+    for name, length in TIME_FILTERS:
+        if span <= length + TIME_FILTER_TOLERANCE:
+            return name
+    return "all"
+
+def plan_listings(time_ranges: Dict, per_window: int, now: datetime.datetime = None,
+                  new_pages: int = 1) -> List[ListingSpec]:
+    """为每个时间范围挑选代价最小的列表组合
+
+    最短的时间范围先用new列表按时间倒序翻页，翻过cutoff即停止，
+    多数subreddit一页内就能完整覆盖；翻完new_pages页仍未到cutoff说明帖子太多，
+    改用对应时间过滤器的top列表。其余时间范围各用一次top列表取前per_window条。
+    now应与构建time_ranges时使用的时间相同，否则按当前时间计算。
+    """
+    now = now or datetime.datetime.utcnow()
+    windows = sorted(time_ranges.items(), key=lambda item: item[1], reverse=True)
+    plans = []
+    for i, (window, cutoff) in enumerate(windows):
+        top = ListingSpec(window, "top", per_window, cutoff, time_filter=time_filter_for(now - cutoff))
+        if i == 0:
+            plans.append(ListingSpec(window, "new", new_pages * PAGE_SIZE, cutoff, fallback=top))
+        else:
+            plans.append(top)
+    return plans
@@ -1,4 +1,3 @@
-from langchain_community.document_loaders import TextLoader
 from langchain_openai import OpenAI
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
@@ -6,43 +5,174 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 import os
 import datetime
 import logging
-from typing import List, Dict
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Tuple
+from llm_cache import LLMCache
+from prompt_packer import PromptPacker
+from ranking import RISING_LIMIT, parse_created, select_report_posts, select_top_posts
+from raw_data import format_post, load_posts, read_header
+from snapshot_store import SnapshotStore, rising_scorer
+from summary_store import SummaryStore
+
+REPORT_TEMPLATE = """
+作为Reddit分析师，请根据以下数据生成报告：
+
+当前日期: {date}
+
+今日主要讨论的帖子: {tables}
+
+原始数据样本: {content}
+
+请用中文撰写今日主要趋势分析，严格按照以下格式输出，不要添加其他标题或内容：
+
+## 今日主要趋势分析
+(在这里分析当前的主要讨论趋势和热点话题)
+"""
+
+MAP_TEMPLATE = """
+作为Reddit分析师，请阅读以下来自 r/{subreddit} 的帖子和评论：
+
+{content}
+
+请用中文简要总结其中的主要讨论话题、重要新闻和社区观点，每条一行，不超过10条，不要添加其他内容。
+"""
+
+REDUCE_TEMPLATE = """
+作为Reddit分析师，请根据以下数据生成报告：
+
+当前日期: {date}
+
+今日主要讨论的帖子: {tables}
+
+各subreddit的讨论摘要:
+{content}
+
+请综合所有subreddit的摘要，用中文撰写今日主要趋势分析，严格按照以下格式输出，不要添加其他标题或内容：
+
+## 今日主要趋势分析
+(在这里分析当前的主要讨论趋势和热点话题)
+"""
+
+TREND_TEMPLATE = """
+作为Reddit分析师，以下是{window_name}每天各subreddit的讨论摘要(按日期排列)：
+
+{content}
+
+请用中文总结{window_name}的主要趋势变化：哪些话题持续升温，哪些是新出现的，哪些热度在下降。
+严格按照以下格式输出，不要添加其他标题或内容：
+
+## {window_name}趋势分析
+(在这里分析{window_name}的趋势变化)
+"""
+
+# 趋势分析的时间范围：名称 -> (标题, 天数)
+TREND_WINDOWS = {"week": ("本周", 7), "month": ("本月", 30)}
+
+AI_NOTE = "\n\n> 本内容由AI自动生成，读者自行辨别\n"
+
+# 报告生成进度的回调：on_event(事件类型, 内容)
+#   stage: 进度说明；section: 一段完整的Markdown；token: 模型流式输出的文本片段
+EventCallback = Callable[[str, str], None]
+
+def _ignore_event(event_type: str, content: str):
+    pass
+
+# 部分模型在输出前加上的角色前缀，写入缓存和报告前去掉
+ASSISTANT_PREFIX = "Assistant: "
+
+class _PrefixStripper:
+    """流式去掉ASSISTANT_PREFIX
+
+    片段末尾可能是前缀的开头时先留着，和下一个片段拼起来再判断，
+    跨片段的前缀也能去掉。
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        text = (self._pending + chunk).replace(ASSISTANT_PREFIX, "")
+        keep = next((n for n in range(min(len(ASSISTANT_PREFIX) - 1, len(text)), 0, -1)
+                     if text.endswith(ASSISTANT_PREFIX[:n])), 0)
+        self._pending = text[len(text) - keep:]
+        return text[:len(text) - keep]
+
+    def flush(self) -> str:
+        text, self._pending = self._pending, ""
+        return text
 
 class LLMAnalyzer:
-    def __init__(self, api_key: str, model_name: str, base_url: str):
+    def __init__(self, api_key: str, model_name: str, base_url: str, cache: LLMCache = None,
+                 subreddit_weights: Dict[str, int] = None, snapshot_store: SnapshotStore = None,
+                 summary_store: SummaryStore = None):
+        self.model_name = model_name
+        self.llm_params = {"base_url": base_url, "max_tokens": 8192}
         self.llm = OpenAI(
             api_key=api_key,
             model_name=model_name,
-            base_url=base_url,
-            max_tokens=8192
+            **self.llm_params
         )
         self.logger = logging.getLogger(__name__)
+        # 持久化响应缓存，提示词相同时直接复用上次的输出
+        self.cache = cache or LLMCache(
+            os.getenv("LLM_CACHE_PATH", os.path.join("reports", "llm_cache.db")),
+            ttl=float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600,
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+        )
+        # single: 按token预算挑选帖子，一次调用；map_reduce: 分subreddit并发总结后再汇总
+        self.analysis_mode = os.getenv("LLM_ANALYSIS_MODE", "single").lower()
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        # 表格排名使用的打分函数(comments/score/velocity/weighted)
+        self.ranking_scorer = os.getenv("RANKING_SCORER", "comments")
+        self.subreddit_weights = subreddit_weights
+        # 历次采集的评分/评论数快照，用于"上升最快"表格；为None时按帖子的平均增速排名
+        self.snapshot_store = snapshot_store
+        # 每天各subreddit的摘要，周/月趋势分析汇总这些摘要而不是重新读取原始数据
+        self.summary_store = summary_store or SummaryStore(
+            os.getenv("SUMMARY_STORE_PATH", os.path.join("reports", "summary_store.db")))
+        # 默认关闭：开启后每次报告要额外为每个subreddit生成每日摘要，并为每个范围调用一次模型
+        self.trend_windows = [w.strip() for w in os.getenv("LLM_TREND_WINDOWS", "").split(",")
+                              if w.strip() in TREND_WINDOWS]
+        self.trend_token_budget = int(os.getenv("LLM_TREND_TOKEN_BUDGET", "6000"))
+        # single模式下按显著性挑选帖子，直到用完token预算
+        self.packer = PromptPacker(
+            self._count_tokens,
+            token_budget=int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "4000")),
+            subreddit_weights=subreddit_weights
+        )
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=20000,
             chunk_overlap=1000,
             length_function=len
         )
 
+    def select_posts(self, posts: List[Dict], time_ranges: Dict, now: datetime.datetime = None) -> List[Dict]:
+        """返回需要拉取评论的帖子：表格中的帖子，single模式下再加上预计放入提示词的帖子
+
+        采集阶段在帖子元数据上调用，按排名顺序返回，表格中的帖子在前。
+        """
+        selected = select_report_posts(posts, time_ranges, scorer=self.ranking_scorer,
+                                       subreddit_weights=self.subreddit_weights)
+        if self.analysis_mode != "map_reduce":
+            seen = {p["id"] for p in selected}
+            selected += [p for p in self.packer.select(posts, now) if p["id"] not in seen]
+        return selected
+
     def _generate_tables(self, posts: List[Dict], time_ranges: Dict, translator) -> Dict:
         """生成分析表格"""
-        def filter_posts(start_time):
-            filtered = []
-            for p in posts:
-                try:
-                    post_time = datetime.datetime.strptime(p['created'], "%Y-%m-%d %H:%M")
-                    if post_time >= start_time:
-                        filtered.append(p)
-                except:
-                    continue
-            return filtered
-        
         # 按时间范围分类
-        daily = sorted(filter_posts(time_ranges["24h"]), 
-                      key=lambda x: x.get('comment_count', 0), reverse=True)[:10]
-        weekly = sorted(filter_posts(time_ranges["week"]), 
-                       key=lambda x: x.get('comment_count', 0), reverse=True)[:7]
-        monthly = sorted(filter_posts(time_ranges["month"]), 
-                        key=lambda x: x.get('comment_count', 0), reverse=True)[:5]
+        top = select_top_posts(posts, time_ranges, scorer=self.ranking_scorer,
+                               subreddit_weights=self.subreddit_weights)
+        daily, weekly, monthly = top["24h"], top["week"], top["month"]
+        # 本周帖子中按最近增速和加速度排名，避免老的长帖总是压过正在快速上升的帖子
+        rising = select_top_posts(posts, time_ranges, limits={"week": RISING_LIMIT},
+                                  scorer=rising_scorer(self.snapshot_store))["week"]
+        
+        # 各表格中的标题一次性批量翻译
+        titles = list(dict.fromkeys(p.get('title', '无标题') for p in daily + weekly + monthly + rising))
+        translated_titles = dict(zip(titles, translator.translate_many(titles)))
         
         # 生成Markdown表格
         def make_table(data, title):
@@ -62,86 +192,242 @@ class LLMAnalyzer:
                 url = p.get('url', '#')
                 
                 table.append(
-                    f"| [{title}]({url}) | {translator.translate(title)} | {flair} | {score} |"
+                    f"| [{title}]({url}) | {translated_titles[title]} | {flair} | {score} |"
                 )
             return "\n".join(table)
         
         return {
             "daily": make_table(daily, "24小时热门"),
             "weekly": make_table(weekly, "本周热门"), 
-            "monthly": make_table(monthly, "本月热门")
+            "monthly": make_table(monthly, "本月热门"),
+            "rising": make_table(rising, "上升最快")
         }
 
-    def generate_report(self, raw_data_file: str, report_file: str, time_ranges: Dict, translator) -> bool:
-        """生成分析报告"""
+    def _complete(self, template: str, force: bool = False, on_token: Callable[[str], None] = None,
+                  **kwargs) -> str:
+        """渲染提示词并调用模型，优先使用缓存
+
+        Args:
+            template: 提示词模板
+            force: 为True时跳过缓存查找，强制重新调用模型(结果仍会写入缓存)
+            on_token: 传入时以流式方式调用模型，每收到一段文本就回调一次；命中缓存时整段回调一次
+
+        返回和回调的文本都已去掉ASSISTANT_PREFIX。
+        """
+        prompt = PromptTemplate(input_variables=list(kwargs), template=template)
+        text = prompt.format(**kwargs)
+        key = LLMCache.make_key(self.model_name, self.llm_params, text)
+        if not force:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.logger.info("命中大模型响应缓存")
+                cached = cached.replace(ASSISTANT_PREFIX, "")
+                if on_token:
+                    on_token(cached)
+                return cached
+        if on_token is None:
+            response = LLMChain(llm=self.llm, prompt=prompt).run(**kwargs).replace(ASSISTANT_PREFIX, "")
+        else:
+            # 返回和缓存的就是回调出去的文本，页面上显示的内容与写入报告的完全一致
+            parts = []
+            stripper = _PrefixStripper()
+            for chunk in self.llm.stream(text):
+                parts.append(stripper.feed(chunk))
+                if parts[-1]:
+                    on_token(parts[-1])
+            parts.append(stripper.flush())
+            if parts[-1]:
+                on_token(parts[-1])
+            response = "".join(parts)
+        self.cache.put(key, response)
+        return response
+
+    def _count_tokens(self, text: str) -> int:
+        """用模型的分词器计算token数，分词器不可用时按4个字符一个token估算"""
+        try:
+            return self.llm.get_num_tokens(text)
+        except Exception:
+            return len(text) // 4 + 1
+
+    def _analyze_single(self, posts: List[Dict], date: str, tables_text: str, force: bool = False,
+                        on_token: Callable[[str], None] = None) -> str:
+        """单次调用：按token预算放入显著性最高的帖子"""
+        return self._complete(
+            REPORT_TEMPLATE, force, on_token,
+            content=self.packer.pack(posts),
+            date=date,
+            tables=tables_text
+        )
+
+    def _map_units(self, posts: List[Dict]) -> List[Tuple[str, str]]:
+        """按subreddit分组，过长的subreddit再按文本块切分，返回(subreddit, 文本)列表"""
+        groups = OrderedDict()
+        for post in posts:
+            groups.setdefault(post.get("subreddit") or "unknown", []).append(format_post(post))
+        units = []
+        for subreddit, blocks in groups.items():
+            for chunk in self.text_splitter.split_text("".join(blocks)):
+                units.append((subreddit, chunk))
+        return units
+
+    def _summarize_subreddits(self, posts: List[Dict], force: bool = False,
+                              on_event: EventCallback = _ignore_event) -> Dict[str, str]:
+        """map阶段：各subreddit(或文本块)并发总结，返回 subreddit -> 摘要
+
+        并发数受LLM_MAX_CONCURRENCY限制。单个文本块总结失败时跳过，不影响其他部分。
+        """
+        units = self._map_units(posts)
+        progress = {"done": 0}
+        lock = threading.Lock()
+
+        def summarize(unit):
+            subreddit, content = unit
+            try:
+                summary = self._complete(MAP_TEMPLATE, force, subreddit=subreddit, content=content)
+            except Exception as e:
+                self.logger.error(f"r/{subreddit} 的摘要生成失败: {str(e)[:200]}")
+                summary = None
+            with lock:
+                progress["done"] += 1
+                on_event("stage", f"r/{subreddit} 摘要完成 ({progress['done']}/{len(units)})")
+            return subreddit, summary
+
+        self.logger.info(f"map阶段: {len(units)} 个文本块，并发数 {self.max_concurrency}")
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            summaries = list(executor.map(summarize, units))
+
+        merged = OrderedDict()
+        for subreddit, summary in summaries:
+            if summary:
+                merged.setdefault(subreddit, []).append(summary.strip())
+        if not merged:
+            raise RuntimeError("所有文本块的摘要均生成失败")
+        return OrderedDict((subreddit, "\n".join(parts)) for subreddit, parts in merged.items())
+
+    def _save_summaries(self, report_date: str, posts: List[Dict], summaries: Dict[str, str]):
+        """保存当天各subreddit的摘要"""
+        counts = {}
+        for post in posts:
+            subreddit = post.get("subreddit") or "unknown"
+            counts[subreddit] = counts.get(subreddit, 0) + 1
+        for subreddit, summary in summaries.items():
+            self.summary_store.save(report_date, subreddit, summary, counts.get(subreddit, 0))
+
+    def _summarize_day(self, posts: List[Dict], collected_at: str, report_date: str, time_ranges: Dict,
+                       force: bool = False, on_event: EventCallback = _ignore_event):
+        """生成并保存当天的每日摘要，供周/月趋势分析汇总
+
+        只覆盖采集前24小时内发布的帖子，各天的摘要互不重叠。失败时只记录日志，不影响报告。
+        """
+        try:
+            day_start = datetime.datetime.strptime(collected_at[:16], "%Y-%m-%d %H:%M") - datetime.timedelta(hours=24)
+        except ValueError:
+            day_start = time_ranges["24h"]
+        daily_posts = [p for p in posts if (parse_created(p) or datetime.datetime.min) >= day_start]
+        if not daily_posts:
+            self.logger.info("最近24小时没有帖子，跳过每日摘要")
+            return
+        on_event("stage", f"生成每日摘要({len(daily_posts)} 条帖子)")
+        try:
+            self._save_summaries(report_date, daily_posts, self._summarize_subreddits(daily_posts, force, on_event))
+        except Exception as e:
+            self.logger.error(f"每日摘要生成失败: {str(e)[:200]}")
+
+    def _analyze_map_reduce(self, summaries: Dict[str, str], date: str, tables_text: str, force: bool = False,
+                            on_token: Callable[[str], None] = None) -> str:
+        """reduce阶段：把各subreddit的摘要汇总为报告，总耗时约为一轮map加一次reduce"""
+        content = "\n\n".join(f"### r/{subreddit}\n{summary}" for subreddit, summary in summaries.items())
+        self.logger.info(f"reduce阶段: 汇总 {len(summaries)} 个subreddit的摘要")
+        return self._complete(REDUCE_TEMPLATE, force, on_token, content=content, date=date, tables=tables_text)
+
+    def _analyze_trends(self, report_date: str, force: bool = False,
+                        on_event: EventCallback = _ignore_event) -> List[str]:
+        """用存下来的每日摘要生成周/月趋势分析，每个时间范围一次调用
+
+        从最近的日期往前放入摘要，直到用完LLM_TREND_TOKEN_BUDGET；不足两天数据的时间范围跳过。
+        """
+        sections = []
+        end = datetime.datetime.strptime(report_date, "%Y-%m-%d")
+        for window in self.trend_windows:
+            window_name, days = TREND_WINDOWS[window]
+            start = (end - datetime.timedelta(days=days - 1)).strftime("%Y-%m-%d")
+            by_date = OrderedDict()
+            for row in self.summary_store.load_range(start, report_date):
+                by_date.setdefault(row["date"], []).append(f"r/{row['subreddit']}: {row['summary']}")
+            if len(by_date) < 2:
+                self.logger.info(f"{window_name}只有 {len(by_date)} 天的摘要，跳过趋势分析")
+                continue
+
+            blocks = []
+            used = 0
+            for day in reversed(by_date):
+                block = f"#### {day}\n" + "\n".join(by_date[day]) + "\n"
+                tokens = self._count_tokens(block)
+                if blocks and used + tokens > self.trend_token_budget:
+                    break
+                blocks.append(block)
+                used += tokens
+            self.logger.info(f"{window_name}趋势分析: 汇总 {len(blocks)} 天的摘要，共 {used} tokens")
+            on_event("stage", f"生成{window_name}趋势分析")
+            on_event("section", "\n\n")
+            try:
+                sections.append(self._complete(TREND_TEMPLATE, force, lambda t: on_event("token", t),
+                                               window_name=window_name, content="\n".join(reversed(blocks))))
+            except Exception as e:
+                self.logger.error(f"{window_name}趋势分析失败: {str(e)[:200]}")
+        return sections
+
+    def generate_report(self, raw_data_file: str, report_file: str, time_ranges: Dict, translator,
+                        force: bool = False, on_event: EventCallback = None) -> bool:
+        """生成分析报告
+
+        Args:
+            force: 为True时跳过大模型响应缓存，强制重新生成分析内容
+            on_event: 进度回调。表格生成后立即回调，分析内容随模型输出逐段回调，
+                页面可以边生成边显示；所有回调拼接起来即为报告内容
+        """
+        on_event = on_event or _ignore_event
+        on_token = lambda t: on_event("token", t)
         try:
             # 加载原始数据
             if not os.path.exists(raw_data_file):
                 raise FileNotFoundError("原始数据文件不存在")
                 
-            loader = TextLoader(raw_data_file, encoding="utf-8")
-            documents = loader.load()
-            
-            # 处理长文本
-            texts = self.text_splitter.split_text(documents[0].page_content)
-            
             # 获取所有帖子数据用于生成表格
-            all_posts = []
-            with open(raw_data_file, "r", encoding="utf-8") as f:
-                current_post = {}
-                for line in f:
-                    if line.startswith("【帖子ID】"):
-                        if current_post:
-                            all_posts.append(current_post)
-                        current_post = {"id": line.strip().split()[-1]}
-                    elif line.startswith("【标题】"):
-                        current_post["title"] = line[4:].strip()
-                    elif line.startswith("【标签】"):
-                        current_post["flair"] = line[4:].strip()
-                    elif line.startswith("【时间】"):
-                        parts = line[4:].strip().split("|")
-                        current_post["created"] = parts[0].strip()
-                        if len(parts) > 1:
-                            current_post["score"] = parts[1].replace("评分:", "").strip()
-                    elif line.startswith("【评论数】"):
-                        current_post["comment_count"] = int(line[5:].strip())
-                    elif line.startswith("【原文链接】"):
-                        current_post["url"] = line[6:].strip()
+            all_posts = load_posts(raw_data_file)
             
             # 生成表格
+            on_event("stage", f"已加载 {len(all_posts)} 条帖子，生成表格")
             tables = self._generate_tables(all_posts, time_ranges, translator)
+            on_event("section", tables.get("daily", "") + "\n\n")
             # 生成报告内容
-            prompt = PromptTemplate(
-                input_variables=["content", "date", "tables"],
-                template="""
-作为Reddit分析师，请根据以下数据生成报告：
-
-当前日期: {date}
-
-今日主要讨论的帖子: {tables}
-
-原始数据样本: {content}
-
-请用中文撰写今日主要趋势分析，严格按照以下格式输出，不要添加其他标题或内容：
-
-## 今日主要趋势分析
-(在这里分析当前的主要讨论趋势和热点话题)
-"""
-            )
-            
-            chain = LLMChain(llm=self.llm, prompt=prompt)
+            date = datetime.datetime.utcnow().strftime("%Y年%m月%d日")
+            # 以采集日期为准保存每日摘要，重新生成旧报告时不会记到今天
+            collected_at = read_header(raw_data_file).get("collected_at") or ""
+            report_date = collected_at[:10] or datetime.datetime.utcnow().strftime("%Y-%m-%d")
+            tables_text = "\n\n".join(tables.values())
             self.logger.info("开始生成报告...")
-            report_content = chain.run(
-                content=texts[0][:15000],  # 使用第一个文本块
-                date=datetime.datetime.utcnow().strftime("%Y年%m月%d日"),
-                tables="\n\n".join(tables.values())
-            )
+            if self.trend_windows:
+                self._summarize_day(all_posts, collected_at, report_date, time_ranges, force, on_event)
+            if self.analysis_mode == "map_reduce":
+                on_event("stage", "生成各subreddit摘要")
+                summaries = self._summarize_subreddits(all_posts, force, on_event)
+                on_event("stage", "生成今日趋势分析")
+                report_content = self._analyze_map_reduce(summaries, date, tables_text, force, on_token)
+            else:
+                on_event("stage", "生成今日趋势分析")
+                report_content = self._analyze_single(all_posts, date, tables_text, force, on_token)
+            trend_sections = self._analyze_trends(report_date, force, on_event)
             # 保存报告
             with open(report_file, "w", encoding="utf-8") as f:
                 f.write(tables.get("daily", ""))
                 f.write("\n\n")
-                f.write(report_content.replace("Assistant: ",""))
-                f.write("\n\n> 本内容由AI自动生成，读者自行辨别\n")
+                f.write(report_content)
+                for section in trend_sections:
+                    f.write("\n\n")
+                    f.write(section)
+                f.write(AI_NOTE)
+            on_event("section", AI_NOTE)
             
             self.logger.info(f"报告生成成功: {report_file}")
             return True
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+from sqlite_store import SQLiteStore
+
+class LLMCache(SQLiteStore):
+    """持久化的大模型响应缓存
+
+    以(模型名, 调用参数, 渲染后的提示词)的哈希为键保存模型输出。同一天重复生成报告时，
+    提示词逐字节相同即直接返回上次的结果，不再消耗token。
+    条目超过有效期后视为未命中；条目数超过上限时按最近使用时间淘汰(LRU)。
+
+    Args:
+        db_path: SQLite数据库路径
+        ttl: 条目有效期(秒)
+        max_entries: 最多保存的条目数
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            response TEXT,
+            created_at REAL,
+            last_used REAL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)",
+    )
+
+    def __init__(self, db_path: str = os.path.join("reports", "llm_cache.db"), ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        super().__init__(db_path)
+
+    @staticmethod
+    def make_key(model_name: str, params: Dict, prompt: str) -> str:
+        payload = json.dumps({"model": model_name, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(f"{payload}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """查找未过期的响应，未命中时返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """保存响应，同时清理过期条目，超过上限时淘汰最久未使用的条目"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if size > self.max_entries:
+                evict = size - self.max_entries
+                self._conn.execute(
+                    """DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_used LIMIT ?)""",
+                    (evict,)
+                )
+                self.logger.info(f"大模型响应缓存淘汰了 {evict} 条最久未使用的记录")
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """返回命中次数、未命中次数和命中率"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
@@ -1,8 +1,15 @@
 import datetime
-import time
 import logging
 import os
-from reddit_client import RedditClient
+import shutil
+from typing import List, Dict
+from reddit_client import RedditClient, parse_credentials
+from comment_sampler import CommentSampler
+from post_store import PostStore
+from ranking import build_time_ranges
+from raw_data import RawDataWriter, export_text, iter_posts
+from reddit_transport import requestor_options, TransportStats
+from snapshot_store import SnapshotStore
 from translation_utils import TranslationUtils
 from llm_analyzer import LLMAnalyzer
 from dotenv import load_dotenv
@@ -23,10 +30,29 @@ logging.basicConfig(
 logger = logging.getLogger()
 
  # 初始化各组件
+transport_stats = TransportStats()
 reddit_client = RedditClient(
     client_id=os.getenv("REDDIT_CLIENT_ID"),
     client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
-    user_agent=os.getenv("REDDIT_USER_AGENT")
+    user_agent=os.getenv("REDDIT_USER_AGENT"),
+    requests_per_minute=int(os.getenv("REDDIT_REQUESTS_PER_MINUTE", "100")),
+    rate_reserve=int(os.getenv("REDDIT_RATE_RESERVE", "20")),
+    post_store=PostStore(os.getenv("POST_STORE_PATH", os.path.join("reports", "post_store.db"))),
+    # live直连；record录制原始响应；replay离线回放录制的响应
+    transport_options=requestor_options(
+        os.getenv("REDDIT_TRANSPORT", "live"),
+        os.getenv("REDDIT_CASSETTE_DIR", "cassettes"),
+        latency=float(os.getenv("REDDIT_REPLAY_LATENCY", "0")),
+        stats=transport_stats
+    ),
+    # 额外的凭据池，subreddit按权重分片到各组凭据
+    credentials=parse_credentials(os.getenv("REDDIT_CREDENTIALS")),
+    comment_sampler=CommentSampler(
+        k=int(os.getenv("COMMENT_TOP_K", "20")),
+        max_depth=int(os.getenv("COMMENT_MAX_DEPTH", "3")),
+        max_length=int(os.getenv("COMMENT_MAX_LENGTH", "300")),
+        char_budget=int(os.getenv("COMMENT_CHAR_BUDGET", "4000"))
+    )
 )
 
 translator = TranslationUtils(
@@ -34,10 +60,20 @@ translator = TranslationUtils(
     access_key_secret=os.getenv("TRANSLATION_ACCESS_KEY_SECRET")
 )
 
+# 每次采集追加评分/评论数快照，用于计算帖子的增速和加速度
+snapshot_store = SnapshotStore(
+    os.getenv("SNAPSHOT_STORE_PATH", os.path.join("reports", "snapshots.bin")),
+    retention_days=int(os.getenv("SNAPSHOT_RETENTION_DAYS", "30")),
+    max_per_post=int(os.getenv("SNAPSHOT_MAX_PER_POST", "48"))
+)
+
 llm_analyzer = LLMAnalyzer(
     api_key=os.getenv("LLM_API_KEY"),
     model_name=os.getenv("LLM_MODEL_NAME"),
-    base_url=os.getenv("LLM_BASE_URL")
+    base_url=os.getenv("LLM_BASE_URL"),
+    # 提示词按subreddit权重挑选帖子，与采集使用同一份subreddits.txt
+    subreddit_weights={s["name"]: s["weight"] for s in reddit_client.load_subreddits()},
+    snapshot_store=snapshot_store
 )
 
 def ensure_date_directory(date_str: str) -> str:
@@ -46,22 +82,71 @@ def ensure_date_directory(date_str: str) -> str:
     os.makedirs(dir_path, exist_ok=True)
     return dir_path
 
-def main():
+def collect_posts(subreddits: List[Dict], time_ranges: Dict, on_subreddit,
+                  now: datetime.datetime = None) -> int:
+    """采集所有subreddit的帖子，每个subreddit完成后立即交给on_subreddit处理
+
+    多个subreddit并发获取，共享请求配额。先获取所有subreddit的元数据，再在全部帖子中
+    统一挑选一次报告表格和提示词会用到的帖子，只为入选的帖子拉取评论。
+
+    Args:
+        subreddits: 要采集的subreddit列表
+        time_ranges: 时间范围字典
+        on_subreddit: 回调函数，参数为(subreddit名称, 帖子列表)
+        now: 构建time_ranges时使用的时间，决定top列表的时间过滤器
+
+    Returns:
+        采集到的帖子总数
+    """
+    total = 0
+    for subreddit, posts in reddit_client.iter_fetch(
+        subreddits, time_ranges,
+        max_workers=int(os.getenv("REDDIT_MAX_WORKERS", "4")),
+        # 之前几天采集过、本次列表中没有出现的帖子，批量刷新评分后参与周/月排名
+        refresh_known=os.getenv("REDDIT_REFRESH_KNOWN", "true").lower() == "true",
+        select=lambda posts: llm_analyzer.select_posts(posts, time_ranges, now),
+        now=now
+    ):
+        on_subreddit(subreddit["name"], posts)
+        total += len(posts)
+    budget = reddit_client.rate_budget()
+    if budget["remaining"] is not None:
+        logger.info(f"Reddit请求配额: 已用 {budget['used']}，剩余 {budget['remaining']:.0f}，"
+                    f"{budget['reset_in']:.0f}秒后重置")
+    return total
+
+def refresh_snapshots(raw_data_file: str, now: datetime.datetime) -> int:
+    """原始数据已采集完整时的轻量快照：批量刷新当天帖子的评分和评论数并追加快照
+
+    每100个帖子只需一次reddit.info请求。同一天重复运行(如每小时一次)时，
+    "上升最快"表格也能得到小时级的增速和加速度。返回刷新成功的帖子数。
+    """
+    posts = [{"id": p["id"], "subreddit": p.get("subreddit"), "score": p.get("score", 0),
+              "comment_count": p.get("comment_count", 0)} for p in iter_posts(raw_data_file)]
+    refreshed = reddit_client.refresh_posts(posts)
+    snapshot_store.record(refreshed, now)
+    snapshot_store.compact(now)
+    return len(refreshed)
+
+def main(on_event=None):
+    """采集数据并生成当天的报告
+
+    Args:
+        on_event: 进度回调on_event(事件类型, 内容)，采集进度以stage事件回调，
+            报告生成的事件见LLMAnalyzer.generate_report
+    """
+    on_event = on_event or (lambda event_type, content: None)
     try:
         # 初始化时间变量
         current_date = datetime.datetime.now().strftime("%Y-%m-%d")
         date_dir = ensure_date_directory(current_date)
         
-        raw_data_file = os.path.join(date_dir, f"reddit_raw_{current_date}.txt")
+        raw_data_file = os.path.join(date_dir, f"reddit_raw_{current_date}.jsonl")
         report_file = os.path.join(date_dir, f"reddit_report_{current_date}.md")
         
         # 时间范围
         now = datetime.datetime.utcnow()
-        time_ranges = {
-            "24h": now - datetime.timedelta(hours=24),
-            "week": now - datetime.timedelta(days=7),
-            "month": now - datetime.timedelta(days=30)
-        }
+        time_ranges = build_time_ranges(now)
 
         # 执行分析流程
         logger.info("启动Reddit分析流程")
@@ -74,44 +159,40 @@ def main():
         subreddit_names = [s["name"] for s in subreddits]
         logger.info(f"将分析以下subreddit: {', '.join(subreddit_names)}")
         
-        # 检查原始数据文件是否已存在且有效
-        if os.path.exists(raw_data_file) and os.path.getsize(raw_data_file) > 100:
+        # 检查原始数据文件是否已完整采集
+        writer = RawDataWriter(raw_data_file)
+        if writer.is_complete():
             logger.info(f"检测到已有数据文件 {raw_data_file}，直接生成报告")
-            return llm_analyzer.generate_report(raw_data_file, report_file, time_ranges, translator)
+            if os.getenv("SNAPSHOT_REFRESH", "true").lower() == "true":
+                on_event("stage", "刷新当天帖子的评分快照")
+                refresh_snapshots(raw_data_file, now)
+            return llm_analyzer.generate_report(raw_data_file, report_file, time_ranges, translator,
+                                                on_event=on_event)
         
-        # 如果文件不存在或无效，则初始化并采集数据
-        with open(raw_data_file, "w", encoding="utf-8") as f:
-            f.write(f"Reddit数据采集\n")
-            f.write(f"采集时间: {now.strftime('%Y-%m-%d %H:%M UTC')}\n")
-            f.write(f"目标subreddit: {', '.join(subreddit_names)}\n")
-            f.write("="*60 + "\n\n")
+        # 如果文件不存在或未采集完整，则从检查点续跑或重新采集
+        resume = os.getenv("RESUME_FETCH", "true").lower() == "true"
+        completed = writer.start(subreddit_names, now, resume=resume)
+        pending = [s for s in subreddits if s["name"] not in completed]
+        on_event("stage", f"开始采集 {len(pending)} 个subreddit")
         
-        # 收集数据
-        all_posts = []
-        for subreddit in subreddits:
-            posts = reddit_client.fetch_posts(subreddit["name"], time_ranges, subreddit["weight"])
-            all_posts.extend(posts)
-            time.sleep(2)
-        
-        # 保存原始数据
-        with open(raw_data_file, "a", encoding="utf-8") as f:
-            for post in all_posts:
-                f.write(f"\n【帖子ID】 {post['id']}\n")
-                f.write(f"【标题】 {post['title']}\n")
-                f.write(f"【作者】 {post['author']}\n")
-                f.write(f"【时间】 {post['created']} | 评分: {post['score']}\n")
-                f.write(f"【评论数】 {post['comment_count']}\n")
-                f.write(f"【内容】\n{post['content'][:2000]}\n")
-                f.write(f"【标签】{post['flair']}")
-                f.write("\n【热门评论】\n")
-                for i, comment in enumerate(post['comments'], 1):
-                    f.write(f"{i}. {comment}\n")
-                f.write(f"\n【原文链接】 {post['url']}\n")
-                f.write("-"*50 + "\n")
+        # 收集数据，每个subreddit完成后立即写入磁盘，同时记录评分/评论数快照
+        def on_subreddit(name, posts):
+            writer.write_subreddit(name, posts)
+            snapshot_store.record(posts, now)
+            completed.add(name)
+            on_event("stage", f"r/{name} 采集完成 ({len(completed)}/{len(subreddit_names)})")
+
+        collect_posts(pending, time_ranges, on_subreddit, now)
+        writer.finish()
+        snapshot_store.compact(now)
+        if os.getenv("RAW_TEXT_EXPORT", "false").lower() == "true":
+            # 可选导出旧版文本格式，供人工查看
+            export_text(raw_data_file, os.path.splitext(raw_data_file)[0] + ".txt")
         
         # 生成报告
-        if os.path.exists(raw_data_file) and os.path.getsize(raw_data_file) > 100:
-            success = llm_analyzer.generate_report(raw_data_file, report_file, time_ranges, translator)
+        if next(iter_posts(raw_data_file), None) is not None:
+            success = llm_analyzer.generate_report(raw_data_file, report_file, time_ranges, translator,
+                                                   on_event=on_event)
             if success:
                 logger.info(f"文件已保存到: {date_dir}")
             return success
@@ -151,7 +232,7 @@ def preview_report(report_path):
 def move_to_lastest():
     current_date = datetime.datetime.now().strftime("%Y-%m-%d")
     print(f"\n分析完成！\n- 数据目录: reports/{current_date}\n"
-            f"- 原始数据: reddit_raw_{current_date}.txt\n"
+            f"- 原始数据: reddit_raw_{current_date}.jsonl\n"
             f"- 分析报告: reddit_report_{current_date}.md")
     
     # 新增：创建last文件夹并写入最新文件
@@ -159,24 +240,28 @@ def move_to_lastest():
     os.makedirs(last_dir, exist_ok=True)
     
     # 定义最新文件路径
+    last_raw_jsonl = os.path.join(last_dir, "lastest_raw.jsonl")
     last_raw_txt = os.path.join(last_dir, "lastest_raw.txt")
     last_raw_js = os.path.join(last_dir, "lastest_raw.js")
     last_report_md = os.path.join(last_dir, "lastest_report.md")
     last_report_png = os.path.join(last_dir, "lastest_report.png")
     
     # 获取当前日期文件路径
-    raw_data_file = os.path.join("reports", current_date, f"reddit_raw_{current_date}.txt")
+    raw_data_file = os.path.join("reports", current_date, f"reddit_raw_{current_date}.jsonl")
+    raw_text_file = os.path.splitext(raw_data_file)[0] + ".txt"
     report_file = os.path.join("reports", current_date, f"reddit_report_{current_date}.md")
     
     # 复制文件到last文件夹
     try:
-        # 复制原始数据文件
-        with open(raw_data_file, 'r', encoding='utf-8') as src, \
-                open(last_raw_txt, 'w+', encoding='utf-8') as dst:
-            dst.write(src.read())
+        # 复制原始数据文件(及可选的文本格式副本)
+        shutil.copyfile(raw_data_file, last_raw_jsonl)
+        if os.path.exists(raw_text_file):
+            shutil.copyfile(raw_text_file, last_raw_txt)
         logger.info(f"转换js文件: {last_raw_js}")
         # 转换并保存JS文件
         convert_to_js(raw_data_file, last_raw_js,translator)
+        stats = translator.cache_stats()
+        logger.info(f"翻译缓存命中 {stats['hits']} 次，未命中 {stats['misses']} 次，命中率 {stats['hit_rate']:.1%}")
         
         # 复制报告文件
         with open(report_file, 'r', encoding='utf-8') as src, \
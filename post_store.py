@@ -0,0 +1,97 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional
+from sqlite_store import SQLiteStore
+
+class PostStore(SQLiteStore):
+    """基于SQLite的本地帖子存储
+
+    以submission.id为键，记录帖子上次抓取时的评分、评论数和已采集的评论，
+    下次运行时评论数没有变化的帖子可以直接复用评论，不必重新拉取评论树。
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS posts (
+            id TEXT PRIMARY KEY,
+            subreddit TEXT,
+            score INTEGER,
+            num_comments INTEGER,
+            comments TEXT,
+            data TEXT,
+            updated_at REAL
+        )""",
+    )
+
+    def __init__(self, db_path: str = os.path.join("reports", "post_store.db")):
+        # 多个抓取线程共享同一个连接，由锁串行化访问
+        super().__init__(db_path)
+
+    def get(self, post_id: str) -> Optional[Dict]:
+        """获取帖子上次的记录，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT score, num_comments, comments, data, updated_at FROM posts WHERE id = ?",
+                (post_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "score": row[0],
+            "num_comments": row[1],
+            "comments": json.loads(row[2]) if row[2] else [],
+            "data": json.loads(row[3]) if row[3] else {},
+            "updated_at": row[4]
+        }
+
+    def save(self, post: Dict, num_comments: int):
+        """保存帖子当前的评分、评论数和评论"""
+        data = {k: v for k, v in post.items() if k != "comments"}
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO posts
+                   (id, subreddit, score, num_comments, comments, data, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    post["id"],
+                    post.get("subreddit"),
+                    post.get("score", 0),
+                    num_comments,
+                    json.dumps(post.get("comments", []), ensure_ascii=False),
+                    json.dumps(data, ensure_ascii=False),
+                    time.time()
+                )
+            )
+            self._conn.commit()
+
+    def update_stats(self, post_id: str, score: int, comment_count: int):
+        """只更新帖子的评分和评论数
+
+        num_comments列记录的是采集评论时的评论数，这里不修改，
+        评论数变化的帖子下次仍会重新拉取评论。
+        """
+        with self._lock:
+            self._conn.execute(
+                """UPDATE posts SET score = ?,
+                       data = json_set(data, '$.score', ?, '$.comment_count', ?),
+                       updated_at = ?
+                   WHERE id = ?""",
+                (score, score, comment_count, time.time(), post_id)
+            )
+            self._conn.commit()
+
+    def load_since(self, start_time: str, subreddit: str = None) -> List[Dict]:
+        """加载发布时间不早于start_time("%Y-%m-%d %H:%M")的帖子，可按subreddit过滤"""
+        sql = "SELECT data, comments FROM posts WHERE json_extract(data, '$.created') >= ?"
+        params = [start_time]
+        if subreddit is not None:
+            sql += " AND subreddit = ?"
+            params.append(subreddit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        posts = []
+        for data, comments in rows:
+            post = json.loads(data)
+            post["comments"] = json.loads(comments) if comments else []
+            posts.append(post)
+        return posts
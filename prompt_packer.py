@@ -0,0 +1,124 @@
+import datetime
+import math
+import logging
+from typing import Callable, Dict, List
+from ranking import DEFAULT_SUBREDDIT_WEIGHT, parse_created
+
+# 剩余预算低于该值时不再尝试放入帖子
+MIN_BLOCK_TOKENS = 50
+
+# 采集阶段还没有正文和评论，按每个token约4个字符估算它们的长度
+CHARS_PER_TOKEN = 4
+
+class PromptPacker:
+    """按token预算挑选写入提示词的帖子
+
+    先按显著性(评分、评论数、发布时间和subreddit权重)给帖子排序，再按顺序放入完整的帖子
+    (正文和评论截断到固定长度)，直到用完token预算。放不下的帖子跳过，继续尝试后面更短的帖子。
+    有评论却没有拉取评论的帖子不放入提示词；采集阶段用select按元数据预估会放入的帖子，
+    只为这些帖子拉取评论。
+
+    Args:
+        count_tokens: 计算文本token数的函数，通常为模型的get_num_tokens
+        token_budget: 帖子内容的token预算
+        subreddit_weights: subreddit -> 权重(与subreddits.txt一致，默认10)
+        content_length: 每个帖子正文保留的最大字符数
+        comment_limit: 每个帖子保留的评论数
+        comment_length: 单条评论保留的最大字符数
+        half_life_hours: 时间衰减的半衰期(小时)
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int], token_budget: int = 4000,
+                 subreddit_weights: Dict[str, int] = None, content_length: int = 500,
+                 comment_limit: int = 3, comment_length: int = 200, half_life_hours: float = 24):
+        self.count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.subreddit_weights = subreddit_weights or {}
+        self.content_length = content_length
+        self.comment_limit = comment_limit
+        self.comment_length = comment_length
+        self.half_life_hours = half_life_hours
+        self.logger = logging.getLogger(__name__)
+
+    def salience(self, post: Dict, now: datetime.datetime) -> float:
+        """帖子的显著性：互动量取对数后乘以时间衰减和subreddit权重"""
+        engagement = math.log1p(max(post.get("score", 0), 0)) + math.log1p(max(post.get("comment_count", 0), 0))
+        created = parse_created(post)
+        age_hours = max((now - created).total_seconds() / 3600, 0) if created else self.half_life_hours * 4
+        decay = 0.5 ** (age_hours / self.half_life_hours)
+        weight = self.subreddit_weights.get(post.get("subreddit"), DEFAULT_SUBREDDIT_WEIGHT) / DEFAULT_SUBREDDIT_WEIGHT
+        return engagement * decay * weight
+
+    def render(self, post: Dict) -> str:
+        """把帖子渲染为紧凑的文本块"""
+        lines = [
+            f"【帖子】 [r/{post.get('subreddit') or 'unknown'}] {post.get('title', '')}\n",
+            f"【时间】 {post.get('created', '')} | 评分: {post.get('score', 0)} | 评论数: {post.get('comment_count', 0)}\n",
+        ]
+        content = (post.get("content") or "").strip()
+        if content:
+            lines.append(f"【内容】 {content[:self.content_length]}\n")
+        comments = (post.get("comments") or [])[:self.comment_limit]
+        if comments:
+            lines.append("【热门评论】\n")
+            for i, comment in enumerate(comments, 1):
+                lines.append(f"{i}. {comment[:self.comment_length]}\n")
+        return "".join(lines)
+
+    def estimate_tokens(self, post: Dict) -> int:
+        """按元数据估算帖子块的token数，正文和评论按截断后的最大长度计
+
+        采集阶段的帖子只有排名字段、标题和正文长度(content_length)，没有正文和评论；
+        用占位的正文和评论渲染出帖子块的骨架，再加上正文和评论按最大长度估算的token数。
+        """
+        content_length = post.get("content_length")
+        if content_length is None:
+            content_length = len(post.get("content") or "")
+        content_length = min(content_length, self.content_length)
+        comments = min(max(post.get("comment_count", 0) or 0, 0), self.comment_limit)
+        skeleton = self.render({
+            "subreddit": post.get("subreddit"), "title": post.get("title", ""), "created": post.get("created", ""),
+            "score": post.get("score", 0), "comment_count": post.get("comment_count", 0),
+            "content": "." if content_length else "", "comments": ["."] * comments
+        })
+        chars = max(content_length - 1, 0) + comments * (self.comment_length - 1)
+        return self.count_tokens(skeleton + "\n") + math.ceil(chars / CHARS_PER_TOKEN)
+
+    def _fill(self, posts: List[Dict], now: datetime.datetime, measure: Callable[[Dict], int]):
+        """按显著性从高到低放入帖子直到用完预算，返回[(帖子, token数)]"""
+        ranked = sorted(posts, key=lambda p: self.salience(p, now), reverse=True)
+        packed = []
+        used = 0
+        for post in ranked:
+            if self.token_budget - used < MIN_BLOCK_TOKENS:
+                break
+            tokens = measure(post)
+            if tokens is None or used + tokens > self.token_budget:
+                continue
+            packed.append((post, tokens))
+            used += tokens
+        return packed
+
+    def select(self, posts: List[Dict], now: datetime.datetime = None) -> List[Dict]:
+        """采集阶段按元数据预估会放入提示词的帖子，按显著性从高到低返回
+
+        评论按最大长度估算，预估的帖子块通常不小于拉取评论后的实际大小，
+        pack时这些帖子基本都能放入，剩余的预算留给表格中已拉取评论的帖子。
+        """
+        now = now or datetime.datetime.utcnow()
+        return [post for post, _ in self._fill(posts, now, self.estimate_tokens)]
+
+    def pack(self, posts: List[Dict], now: datetime.datetime = None) -> str:
+        """按显著性从高到低放入帖子，返回不超过token预算的文本"""
+        now = now or datetime.datetime.utcnow()
+
+        def measure(post):
+            if (post.get("comment_count", 0) or 0) > 0 and not post.get("comments"):
+                # 采集时没有入选、没有拉取评论的帖子
+                return None
+            return self.count_tokens(self.render(post) + "\n")
+
+        packed = self._fill(posts, now, measure)
+        used = sum(tokens for _, tokens in packed)
+        self.logger.info(f"提示词放入 {len(packed)}/{len(posts)} 个帖子，共 {used} tokens")
+        return "".join(self.render(post) + "\n" for post, _ in packed)
@@ -0,0 +1,167 @@
+import datetime
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, List, Dict, Union
+
+# 各时间范围的表格保留的帖子数
+TABLE_LIMITS = {"24h": 10, "week": 7, "month": 5}
+
+# "上升最快"表格在本周帖子中保留的帖子数
+RISING_LIMIT = 5
+
+# subreddits.txt中未写权重时的默认值
+DEFAULT_SUBREDDIT_WEIGHT = 10
+
+# 缓存的PostFrame数量
+FRAME_CACHE_SIZE = 4
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def build_time_ranges(now: datetime.datetime) -> Dict:
+    """以now为基准构建24小时、本周、本月的时间范围"""
+    return {
+        "24h": now - datetime.timedelta(hours=24),
+        "week": now - datetime.timedelta(days=7),
+        "month": now - datetime.timedelta(days=30)
+    }
+
+def parse_created(post: Dict):
+    """解析帖子的发布时间，格式错误时返回None"""
+    # PostRecord在解析时已转换好发布时间
+    created_at = getattr(post, "created_at", None)
+    if created_at is not None:
+        return created_at
+    try:
+        return datetime.datetime.strptime(post['created'], "%Y-%m-%d %H:%M")
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def to_timestamp(dt: datetime.datetime) -> float:
+    """把UTC的naive datetime转换为秒数"""
+    return (dt - _EPOCH).total_seconds()
+
+class PostFrame:
+    """帖子的列式视图
+
+    发布时间、评分、评论数和subreddit权重各解析一次，存为numpy数组，
+    之后所有时间范围的筛选和打分都是向量运算。
+
+    Args:
+        posts: 帖子列表(PostRecord或字典)
+        subreddit_weights: subreddit -> 权重，未列出的按默认权重10计算
+    """
+
+    def __init__(self, posts: List[Dict], subreddit_weights: Dict[str, int] = None):
+        self.posts = posts
+        weights = subreddit_weights or {}
+        created = [parse_created(p) for p in posts]
+        self.created = np.array([to_timestamp(c) if c is not None else np.nan for c in created], dtype=float)
+        self.score = np.array([p.get('score', 0) or 0 for p in posts], dtype=float)
+        self.comment_count = np.array([p.get('comment_count', 0) or 0 for p in posts], dtype=float)
+        self.weight = np.array([weights.get(p.get('subreddit'), DEFAULT_SUBREDDIT_WEIGHT) for p in posts],
+                               dtype=float) / DEFAULT_SUBREDDIT_WEIGHT
+
+    def __len__(self):
+        return len(self.posts)
+
+    def age_hours(self, now: datetime.datetime) -> np.ndarray:
+        """发布至今的小时数，不足1小时按1小时计"""
+        return np.maximum((to_timestamp(now) - self.created) / 3600, 1.0)
+
+    def window_mask(self, starts: List[datetime.datetime]) -> np.ndarray:
+        """一次计算所有时间范围的成员关系，返回(时间范围数, 帖子数)的布尔矩阵"""
+        start_ts = np.array([to_timestamp(s) for s in starts], dtype=float)
+        # 发布时间缺失(NaN)的帖子比较结果为False，不属于任何时间范围
+        return self.created[None, :] >= start_ts[:, None]
+
+_frame_cache = OrderedDict()
+_frame_lock = threading.Lock()
+
+def frame_for(posts: List[Dict], subreddit_weights: Dict[str, int] = None) -> PostFrame:
+    """返回帖子列表的PostFrame
+
+    load_posts对同一文件返回同一个列表对象，按列表对象缓存后，报告中多次排名
+    只解析一次发布时间。列表中的元素被增删、替换或重新排序后缓存失效；
+    帖子本身的字段被原地修改时无法察觉，帖子应视为只读。
+    """
+    key = (id(posts), tuple(sorted((subreddit_weights or {}).items())))
+    members = tuple(map(id, posts))
+    with _frame_lock:
+        entry = _frame_cache.get(key)
+        if entry is not None and entry[0] is posts and entry[1] == members:
+            _frame_cache.move_to_end(key)
+            return entry[2]
+    frame = PostFrame(posts, subreddit_weights)
+    with _frame_lock:
+        _frame_cache[key] = (posts, members, frame)
+        while len(_frame_cache) > FRAME_CACHE_SIZE:
+            _frame_cache.popitem(last=False)
+    return frame
+
+# 打分函数：输入PostFrame和当前时间，返回每个帖子的得分，分数越高排名越靠前
+SCORERS: Dict[str, Callable[[PostFrame, datetime.datetime], np.ndarray]] = {
+    "comments": lambda frame, now: frame.comment_count,
+    "score": lambda frame, now: frame.score,
+    # 每小时获得的互动(评分+评论数)，新帖不会被老的长帖压制
+    "velocity": lambda frame, now: (frame.score + frame.comment_count) / frame.age_hours(now),
+    # 评论数按subreddit权重加权
+    "weighted": lambda frame, now: frame.comment_count * frame.weight,
+}
+
+Scorer = Union[str, Callable[[PostFrame, datetime.datetime], np.ndarray]]
+
+def top_k(keys: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+    """在候选下标中取得分最高的k个，按得分降序返回
+
+    用np.partition在O(n)内找出第k大的得分，只对这k个排序。得分相同时保留下标较小(原顺序靠前)的帖子，
+    与稳定排序的结果一致。
+    """
+    if k <= 0 or len(candidates) == 0:
+        return candidates[:0]
+    values = keys[candidates]
+    if len(candidates) > k:
+        kth = np.partition(values, len(values) - k)[len(values) - k]
+        above = candidates[values > kth]
+        ties = candidates[values == kth][:k - len(above)]
+        candidates = np.concatenate([above, ties])
+        values = keys[candidates]
+    return candidates[np.lexsort((candidates, -values))]
+
+def rank_windows(frame: PostFrame, time_ranges: Dict, limits: Dict = TABLE_LIMITS, scorer: Scorer = "comments",
+                 now: datetime.datetime = None) -> Dict[str, List[Dict]]:
+    """按时间范围筛选帖子并取出各范围的热门帖子
+
+    Args:
+        frame: 帖子的列式视图
+        time_ranges: 时间范围 -> 起始时间(UTC)
+        limits: 时间范围 -> 保留的帖子数
+        scorer: SCORERS中的名称或自定义打分函数
+        now: 计算帖子年龄的当前时间，默认为UTC当前时间
+    """
+    now = now or datetime.datetime.utcnow()
+    score_func = SCORERS[scorer] if isinstance(scorer, str) else scorer
+    keys = np.asarray(score_func(frame, now), dtype=float)
+    windows = list(limits)
+    mask = frame.window_mask([time_ranges[w] for w in windows])
+    return {
+        window: [frame.posts[i] for i in top_k(keys, np.flatnonzero(mask[row]), limits[window])]
+        for row, window in enumerate(windows)
+    }
+
+def select_top_posts(posts: List[Dict], time_ranges: Dict, limits: Dict = TABLE_LIMITS, scorer: Scorer = "comments",
+                     subreddit_weights: Dict[str, int] = None, now: datetime.datetime = None) -> Dict[str, List[Dict]]:
+    """按时间范围筛选帖子，并按打分函数(默认评论数)取出各范围的热门帖子"""
+    return rank_windows(frame_for(posts, subreddit_weights), time_ranges, limits, scorer, now)
+
+def select_report_posts(posts: List[Dict], time_ranges: Dict, scorer: Scorer = "comments",
+                        subreddit_weights: Dict[str, int] = None) -> List[Dict]:
+    """返回会出现在报告表格中的帖子(按id去重，保持排名顺序)"""
+    selected = []
+    seen = set()
+    for top in select_top_posts(posts, time_ranges, scorer=scorer, subreddit_weights=subreddit_weights).values():
+        for p in top:
+            if p['id'] not in seen:
+                seen.add(p['id'])
+                selected.append(p)
+    return selected
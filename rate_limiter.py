@@ -0,0 +1,132 @@
+import threading
+import time
+from typing import Callable, Dict
+
+
+class TokenBucket:
+    """线程安全的令牌桶，多个工作线程共享同一份请求配额"""
+
+    def __init__(self, rate: float, capacity: int, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate: 每秒补充的令牌数，小于等于0表示不限流
+            capacity: 桶容量，即允许的最大突发请求数
+            clock: 单调时钟，测试时可替换
+            sleep: 等待函数，测试时可替换
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_quota(cls, requests: int, period: float) -> "TokenBucket":
+        """根据配额(period秒内允许requests次请求)创建令牌桶"""
+        return cls(rate=requests / period, capacity=requests)
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: int = 1):
+        """获取令牌，令牌不足时阻塞等待"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            self._sleep(wait)
+
+    @property
+    def available(self) -> float:
+        """当前可用令牌数"""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class RateGovernor:
+    """根据Reddit返回的限流信息(praw的auth.limits)自适应调节请求速度
+
+    配额充足时不做任何等待；剩余配额低于保留值后，把剩余请求均匀分布到
+    重置时间之前；配额耗尽时等待到重置时间。
+    """
+
+    def __init__(self, reserve: int = 20, clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            reserve: 剩余请求数高于该值时全速运行
+            clock: 返回当前Unix时间戳的时钟，与reset_timestamp比较，测试时可替换
+            sleep: 等待函数，测试时可替换
+        """
+        self.reserve = reserve
+        self._clock = clock
+        self._sleep = sleep
+        self._remaining = None
+        self._used = None
+        self._reset_timestamp = None
+        self._lock = threading.Lock()
+
+    def update(self, limits: Dict):
+        """用最新的限流信息更新预算
+
+        多个线程各自持有praw实例，返回的限流信息可能有先后，
+        同一重置窗口内只采用更小的剩余值。
+        """
+        remaining = limits.get("remaining")
+        reset_timestamp = limits.get("reset_timestamp")
+        if remaining is None or reset_timestamp is None:
+            return
+        with self._lock:
+            if self._reset_timestamp is None or reset_timestamp > self._reset_timestamp + 1:
+                # 进入新的配额窗口
+                self._remaining = remaining
+                self._reset_timestamp = reset_timestamp
+                self._used = limits.get("used")
+            elif remaining < self._remaining:
+                self._remaining = remaining
+                self._used = limits.get("used")
+
+    def _delay(self, now: float) -> float:
+        if self._remaining is None:
+            return 0.0
+        reset_in = max(0.0, self._reset_timestamp - now)
+        if reset_in == 0:
+            return 0.0
+        if self._remaining > self.reserve:
+            return 0.0
+        if self._remaining < 1:
+            return reset_in
+        return reset_in / self._remaining
+
+    def wait(self, requests: int = 1):
+        """按当前预算等待，并预扣requests次请求"""
+        with self._lock:
+            delay = self._delay(self._clock())
+            if self._remaining is not None:
+                self._remaining = max(0.0, self._remaining - requests)
+        if delay > 0:
+            self._sleep(delay)
+
+    def budget(self) -> Dict:
+        """返回当前预算：剩余请求数、已用请求数、重置时间戳和距重置的秒数"""
+        with self._lock:
+            reset_in = None
+            if self._reset_timestamp is not None:
+                reset_in = max(0.0, self._reset_timestamp - self._clock())
+            return {
+                "remaining": self._remaining,
+                "used": self._used,
+                "reset_timestamp": self._reset_timestamp,
+                "reset_in": reset_in
+            }
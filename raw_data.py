@@ -0,0 +1,347 @@
+import json
+import os
+import re
+import threading
+import logging
+import datetime
+from collections import OrderedDict
+from typing import List, Dict, Set, Iterator
+from dedup import dedupe_posts
+
+# 原始数据JSONL格式的版本号，字段变化时递增
+SCHEMA_VERSION = 1
+
+# 帖子记录的字段
+POST_FIELDS = ("id", "title", "author", "created", "score", "comment_count",
+               "content", "flair", "comments", "url", "subreddit")
+
+# 文本格式中内容块保留的最大字符数
+TEXT_CONTENT_LIMIT = 2000
+
+# 帖子时间的格式
+CREATED_FORMAT = "%Y-%m-%d %H:%M"
+
+# load_posts缓存的文件数
+LOAD_CACHE_SIZE = 4
+
+logger = logging.getLogger(__name__)
+
+class PostRecord:
+    """紧凑的帖子记录
+
+    解析时就把评分、评论数转换为整数，发布时间解析为created_at，
+    下游不必再做int()和strptime。同时支持record["title"]和record.get("title")的访问方式。
+    """
+    __slots__ = POST_FIELDS + ("created_at",)
+
+    def __init__(self, id: str, title: str = "", author: str = "", created: str = "", score=0,
+                 comment_count=0, content: str = "", flair: str = None, comments: List[str] = None,
+                 url: str = "", subreddit: str = None):
+        self.id = id
+        self.title = title or ""
+        self.author = author or ""
+        self.created = created or ""
+        self.score = int(score or 0)
+        self.comment_count = int(comment_count or 0)
+        self.content = content or ""
+        self.flair = flair
+        self.comments = comments or []
+        self.url = url or ""
+        self.subreddit = subreddit
+        try:
+            self.created_at = datetime.datetime.strptime(self.created, CREATED_FORMAT)
+        except ValueError:
+            self.created_at = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PostRecord":
+        return cls(**{field: data.get(field) for field in POST_FIELDS})
+
+    def to_dict(self) -> Dict:
+        """转换为普通字典(评论列表为副本)"""
+        data = {field: getattr(self, field) for field in POST_FIELDS}
+        data["comments"] = list(self.comments)
+        return data
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+
+def format_header(collected_at: str, subreddit_names: List[str]) -> str:
+    """生成文本格式的文件头"""
+    return (f"Reddit数据采集\n"
+            f"采集时间: {collected_at}\n"
+            f"目标subreddit: {', '.join(subreddit_names)}\n"
+            + "="*60 + "\n\n")
+
+def format_post(post: Dict) -> str:
+    """把帖子格式化为文本格式的数据块"""
+    lines = [
+        f"\n【帖子ID】 {post['id']}\n",
+        f"【标题】 {post['title']}\n",
+        f"【作者】 {post['author']}\n",
+        f"【时间】 {post['created']} | 评分: {post['score']}\n",
+        f"【评论数】 {post['comment_count']}\n",
+        f"【内容】\n{post['content'][:TEXT_CONTENT_LIMIT]}\n",
+        f"【标签】{post['flair']}",
+        "\n【热门评论】\n",
+    ]
+    for i, comment in enumerate(post['comments'], 1):
+        lines.append(f"{i}. {comment}\n")
+    lines.append(f"\n【原文链接】 {post['url']}\n")
+    lines.append("-"*50 + "\n")
+    return "".join(lines)
+
+def _iter_jsonl(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # 中断时可能留下写了一半的最后一行
+                logger.warning(f"跳过无法解析的行: {line[:100]}")
+
+def _iter_text_posts(path: str) -> Iterator[Dict]:
+    """解析旧版【】文本格式"""
+    post = None
+    section = None
+    with open(path, "r", encoding="utf-8") as f:
+        for raw_line in f:
+            line = raw_line.strip()
+            if line.startswith("【帖子ID】"):
+                if post:
+                    post["content"] = post["content"].rstrip("\n")
+                    yield post
+                post = {"id": line[6:].strip(), "title": "", "author": "", "created": "",
+                        "score": 0, "comment_count": 0, "content": "", "flair": None,
+                        "comments": [], "url": "", "subreddit": None}
+                section = None
+            elif post is None:
+                continue
+            elif line.startswith("【标题】"):
+                post["title"] = line[4:].strip()
+            elif line.startswith("【作者】"):
+                post["author"] = line[4:].strip()
+            elif line.startswith("【时间】"):
+                parts = line[4:].strip().split("|")
+                post["created"] = parts[0].strip()
+                if len(parts) > 1:
+                    post["score"] = int(parts[1].replace("评分:", "").strip() or 0)
+            elif line.startswith("【评论数】"):
+                post["comment_count"] = int(line[5:].strip() or 0)
+            elif line.startswith("【内容】"):
+                section = "content"
+            elif line.startswith("【标签】"):
+                flair = line[4:].strip()
+                post["flair"] = None if flair in ("", "None") else flair
+                section = None
+            elif line.startswith("【热门评论】"):
+                section = "comments"
+            elif line.startswith("【原文链接】"):
+                post["url"] = line[6:].strip()
+                match = re.search(r"/r/([^/]+)/", post["url"])
+                if match:
+                    post["subreddit"] = match.group(1)
+                section = None
+            elif section == "content":
+                post["content"] += raw_line
+            elif section == "comments":
+                match = re.match(r"(\d+)\. (.*)", line)
+                if match:
+                    post["comments"].append(match.group(2))
+    if post:
+        post["content"] = post["content"].rstrip("\n")
+        yield post
+
+def read_header(path: str) -> Dict:
+    """读取文件头信息(采集时间和subreddit列表)"""
+    if path.endswith(".jsonl"):
+        for record in _iter_jsonl(path):
+            if record.get("type") == "header":
+                return record
+            break
+        return {}
+    header = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("采集时间:"):
+                header["collected_at"] = line.split(":", 1)[1].strip()
+            elif line.startswith("目标subreddit:"):
+                header["subreddits"] = [s.strip() for s in line.split(":", 1)[1].split(",") if s.strip()]
+            elif line.startswith("="):
+                break
+    return header
+
+def iter_posts(path: str) -> Iterator[PostRecord]:
+    """单遍流式读取原始数据文件中的帖子，兼容JSONL格式和旧版文本格式"""
+    if not path.endswith(".jsonl"):
+        for post in _iter_text_posts(path):
+            yield PostRecord.from_dict(post)
+        return
+    for record in _iter_jsonl(path):
+        if record.get("type") == "header" and record.get("version", 0) > SCHEMA_VERSION:
+            logger.warning(f"{path} 的格式版本 {record['version']} 高于当前支持的 {SCHEMA_VERSION}")
+        if record.get("type") != "post":
+            continue
+        yield PostRecord.from_dict(record)
+
+_load_cache = OrderedDict()
+_load_lock = threading.Lock()
+
+def load_posts(path: str, dedup: bool = True) -> List[PostRecord]:
+    """读取原始数据文件中的全部帖子
+
+    结果按(路径, 修改时间, 大小)缓存，同一次运行中表格生成、提示词构建和JS导出
+    共享同一份解析结果。返回的记录应视为只读，需要修改时先调用to_dict。
+
+    Args:
+        dedup: 是否合并跨subreddit转发和近似重复的帖子(评分和评论数累加)。
+            原始数据文件按subreddit流式写入，保留全部帖子，去重在读取时进行
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, dedup)
+    with _load_lock:
+        if key in _load_cache:
+            _load_cache.move_to_end(key)
+            return _load_cache[key]
+    posts = list(iter_posts(path))
+    if dedup:
+        posts = [p if isinstance(p, PostRecord) else PostRecord.from_dict(p) for p in dedupe_posts(posts)]
+    with _load_lock:
+        _load_cache[key] = posts
+        while len(_load_cache) > LOAD_CACHE_SIZE:
+            _load_cache.popitem(last=False)
+    return posts
+
+def _iter_text(path: str) -> Iterator[str]:
+    """逐段渲染文本格式：原样输出文件中的每个帖子，不做读取时的去重"""
+    header = read_header(path)
+    yield format_header(header.get("collected_at", ""), header.get("subreddits", []))
+    for post in iter_posts(path):
+        yield format_post(post)
+
+def to_text(path: str) -> str:
+    """把原始数据文件渲染为文本格式"""
+    return "".join(_iter_text(path))
+
+def export_text(path: str, text_path: str):
+    """导出文本格式的副本，供人工查看，与原始数据文件中的帖子一一对应"""
+    with open(text_path, "w", encoding="utf-8") as f:
+        f.writelines(_iter_text(path))
+
+def raw_file_for_report(report_path: str) -> str:
+    """根据报告文件路径找到对应的原始数据文件，优先使用JSONL格式"""
+    base = os.path.splitext(report_path.replace('_report', '_raw'))[0]
+    for ext in (".jsonl", ".txt"):
+        if os.path.exists(base + ext):
+            return base + ext
+    return base + ".jsonl"
+
+class RawDataWriter:
+    """流式写入JSONL格式的原始数据文件
+
+    第一行为文件头(type为header，带格式版本号)，之后每行一条帖子(type为post)。
+
+    每个subreddit的帖子到达后立即追加写入并fsync，随后原子地更新检查点文件，
+    记录已完成的subreddit和对应的文件长度。运行中断后可以从检查点续跑：
+    截掉最后一个未完成subreddit写了一半的内容，只抓取剩余的subreddit。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.checkpoint_path = f"{path}.progress"
+        self._lock = threading.Lock()
+        self._completed = []
+        self._offset = 0
+        self.logger = logging.getLogger(__name__)
+
+    def _load_checkpoint(self) -> Dict:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_checkpoint(self, complete: bool = False):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"completed": self._completed, "offset": self._offset, "complete": complete},
+                      f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def is_complete(self) -> bool:
+        """原始数据文件是否已完整采集
+
+        没有检查点的旧文件沿用原来的判断：存在且大于100字节即视为完整。
+        """
+        if not os.path.exists(self.path):
+            return False
+        checkpoint = self._load_checkpoint()
+        if checkpoint is None:
+            return os.path.getsize(self.path) > 100
+        return checkpoint.get("complete", False)
+
+    def start(self, subreddit_names: List[str], collected_at: datetime.datetime, resume: bool = True) -> Set[str]:
+        """开始写入，返回可以跳过的已完成subreddit
+
+        Args:
+            subreddit_names: 本次要采集的subreddit
+            collected_at: 采集时间(UTC)
+            resume: 是否从检查点续跑；为False时总是重新开始
+        """
+        checkpoint = self._load_checkpoint() if resume else None
+        if checkpoint is not None and os.path.exists(self.path):
+            self._completed = checkpoint.get("completed", [])
+            self._offset = checkpoint.get("offset", 0)
+            # 截掉中断时写了一半的subreddit
+            with open(self.path, "r+b") as f:
+                f.truncate(self._offset)
+            self.logger.info(f"从检查点续跑，跳过已完成的subreddit: {', '.join(self._completed)}")
+            return set(self._completed)
+
+        header = {
+            "type": "header",
+            "version": SCHEMA_VERSION,
+            "collected_at": collected_at.strftime('%Y-%m-%d %H:%M UTC'),
+            "subreddits": subreddit_names
+        }
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._completed = []
+        self._offset = os.path.getsize(self.path)
+        self._save_checkpoint()
+        return set()
+
+    def write_subreddit(self, subreddit_name: str, posts: List[Dict]):
+        """追加写入一个subreddit的全部帖子并记录检查点"""
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for post in posts:
+                    record = {"type": "post"}
+                    record.update({field: post.get(field) for field in POST_FIELDS})
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._offset = os.path.getsize(self.path)
+            self._completed.append(subreddit_name)
+            self._save_checkpoint()
+
+    def finish(self):
+        """标记采集完成"""
+        with self._lock:
+            self._save_checkpoint(complete=True)
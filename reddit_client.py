@@ -1,17 +1,185 @@
 import praw
 import datetime
-import time
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict
+from rate_limiter import TokenBucket, RateGovernor
+from post_store import PostStore
+from comment_sampler import CommentSampler
+from listing_planner import ListingSpec, plan_listings, PAGE_SIZE
+
+# Reddit OAuth 配额：每分钟100次请求
+DEFAULT_REQUESTS_PER_MINUTE = 100
+# 未指定max_posts时每个时间范围获取的帖子数
+DEFAULT_POSTS_PER_WINDOW = 25
+# reddit.info每次请求最多查询的fullname数
+INFO_BATCH_SIZE = 100
+
+# 跨subreddit统一挑选帖子时使用的字段；标题和正文长度用于估算提示词能放入多少帖子
+RANKING_FIELDS = ("id", "subreddit", "created", "score", "comment_count", "title")
+
+logger = logging.getLogger(__name__)
+
+def ranking_key(post: Dict) -> Dict:
+    """帖子用于排名的轻量字段，不含正文和评论，只保留正文长度(content_length)"""
+    key = {field: post.get(field) for field in RANKING_FIELDS}
+    key["content_length"] = len(post.get("content") or "")
+    return key
+
+class RedditCredential:
+    """一组Reddit API凭据，拥有独立的请求预算"""
+
+    def __init__(self, client_id: str, client_secret: str, user_agent: str, weight: int = 1,
+                 requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE, rate_reserve: int = 20,
+                 transport_options: Dict = None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.user_agent = user_agent
+        # 分片时按权重分配subreddit
+        self.weight = weight
+        # 传给praw.Reddit的额外参数，录制/回放模式下替换底层requestor
+        self.transport_options = transport_options or {}
+        # praw实例不是线程安全的，每个线程单独持有一个
+        self._local = threading.local()
+        # 使用该凭据的所有工作线程共享同一个令牌桶
+        self.rate_limiter = TokenBucket.from_quota(requests_per_minute, 60)
+        # 根据Reddit返回的剩余配额自适应退避
+        self.rate_governor = RateGovernor(reserve=rate_reserve)
+
+    @property
+    def reddit(self) -> praw.Reddit:
+        """获取当前线程使用该凭据的praw实例"""
+        if getattr(self._local, "reddit", None) is None:
+            self._local.reddit = praw.Reddit(
+                client_id=self.client_id,
+                client_secret=self.client_secret,
+                user_agent=self.user_agent,
+                **self.transport_options
+            )
+        return self._local.reddit
+
+    def throttle(self, requests: int = 1):
+        """发起请求前按该凭据的配额和Reddit剩余配额节流"""
+        self.rate_governor.update(self.reddit.auth.limits)
+        self.rate_governor.wait(requests)
+        self.rate_limiter.acquire(requests)
+
+def parse_credentials(value: str) -> List[Dict]:
+    """解析额外凭据配置，格式为 client_id:client_secret[:weight]，多组以逗号分隔
+
+    格式错误的项记录日志后跳过，不影响其他凭据；全部无效时只使用主凭据。
+    """
+    credentials = []
+    for i, item in enumerate((value or "").split(","), 1):
+        item = item.strip()
+        if not item:
+            continue
+        parts = [part.strip() for part in item.split(":")]
+        if len(parts) not in (2, 3) or not parts[0] or not parts[1]:
+            logger.error(f"REDDIT_CREDENTIALS第{i}项格式错误，应为 client_id:client_secret[:weight]，已跳过")
+            continue
+        try:
+            weight = int(parts[2]) if len(parts) > 2 and parts[2] else 1
+        except ValueError:
+            weight = 0
+        if weight <= 0:
+            logger.error(f"REDDIT_CREDENTIALS第{i}项的权重必须是正整数，已跳过")
+            continue
+        credentials.append({"client_id": parts[0], "client_secret": parts[1], "weight": weight})
+    return credentials
+
+def shard_subreddits(subreddits: List[Dict], credentials: List[RedditCredential]) -> Dict[str, RedditCredential]:
+    """按权重把subreddit分配给各组凭据
+
+    subreddit的权重即其抓取量，贪心地分给"已分配量/凭据权重"最小的凭据。
+    """
+    loads = [0] * len(credentials)
+    assignment = {}
+    for subreddit in sorted(subreddits, key=lambda s: s["weight"], reverse=True):
+        i = min(range(len(credentials)),
+                key=lambda j: (loads[j] + subreddit["weight"]) / credentials[j].weight)
+        loads[i] += subreddit["weight"]
+        assignment[subreddit["name"]] = credentials[i]
+    return assignment
 
 class RedditClient:
-    def __init__(self, client_id: str, client_secret: str, user_agent: str):
-        self.reddit = praw.Reddit(
-            client_id=client_id,
-            client_secret=client_secret,
-            user_agent=user_agent
-        )
+    def __init__(self, client_id: str, client_secret: str, user_agent: str,
+                 requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE, rate_reserve: int = 20,
+                 post_store: PostStore = None, transport_options: Dict = None,
+                 credentials: List[Dict] = None, comment_sampler: CommentSampler = None):
+        """
+        Args:
+            credentials: 额外的凭据列表(可选)，每项包含client_id、client_secret和weight，
+                与主凭据一起组成凭据池，subreddit按权重分片到各组凭据上并发抓取
+            comment_sampler: 评论抽样器(可选)，默认保留评分最高的20条评论
+        """
+        pool = [{"client_id": client_id, "client_secret": client_secret, "weight": 1}]
+        pool.extend(credentials or [])
+        self.credentials = [
+            RedditCredential(
+                c["client_id"], c["client_secret"], user_agent,
+                weight=c.get("weight", 1),
+                requests_per_minute=requests_per_minute,
+                rate_reserve=rate_reserve,
+                transport_options=transport_options
+            )
+            for c in pool
+        ]
+        # 当前线程正在使用的凭据
+        self._local = threading.local()
+        # subreddit到凭据的分片结果
+        self._shards = {}
+        # 已抓取帖子的本地存储(可选)，用于跳过评论数未变化的帖子
+        self.post_store = post_store
+        self.comment_sampler = comment_sampler or CommentSampler()
         self.logger = logging.getLogger(__name__)
+
+    @property
+    def credential(self) -> RedditCredential:
+        """当前线程使用的凭据，默认为主凭据"""
+        return getattr(self._local, "credential", None) or self.credentials[0]
+
+    @property
+    def reddit(self) -> praw.Reddit:
+        """获取当前线程的praw实例"""
+        return self.credential.reddit
+
+    def _throttle(self, requests: int = 1):
+        """发起请求前按当前凭据的配额节流"""
+        self.credential.throttle(requests)
+
+    def _run_with(self, credential: RedditCredential, func, *args):
+        """在当前线程上切换到指定凭据执行func"""
+        previous = getattr(self._local, "credential", None)
+        self._local.credential = credential
+        try:
+            return func(*args)
+        finally:
+            self._local.credential = previous
+
+    def _credential_for(self, subreddit_name: str, index: int = 0) -> RedditCredential:
+        """返回subreddit分片到的凭据，未分片时轮流使用"""
+        credential = self._shards.get(subreddit_name)
+        if credential is None:
+            credential = self.credentials[index % len(self.credentials)]
+        return credential
+
+    def rate_budget(self) -> Dict:
+        """当前的Reddit请求预算(所有凭据合计)，供流水线记录日志和调度"""
+        budgets = [c.rate_governor.budget() for c in self.credentials]
+        known = [b for b in budgets if b["remaining"] is not None]
+        if not known:
+            return {"remaining": None, "used": None, "reset_timestamp": None,
+                    "reset_in": None, "credentials": budgets}
+        return {
+            "remaining": sum(b["remaining"] for b in known),
+            "used": sum(b["used"] or 0 for b in known),
+            "reset_timestamp": min(b["reset_timestamp"] for b in known),
+            "reset_in": min(b["reset_in"] for b in known),
+            "credentials": budgets
+        }
         
     def load_subreddits(self, file_path: str = "subreddits.txt") -> List[Dict[str, int]]:
         """加载subreddit列表及其权重"""
@@ -32,61 +200,240 @@ class RedditClient:
             self.logger.error(f"Subreddit列表文件 {file_path} 未找到")
             return []
 
-    def fetch_posts(self, subreddit_name: str, time_ranges: Dict, max_posts: int = None) -> List[Dict]:
-        """获取指定subreddit的帖子
-        
+    def _fetch_comments(self, submission) -> List[str]:
+        """拉取帖子的评论树"""
+        # 加载评论树和展开更多评论各消耗一次请求
+        self._throttle(2)
+        submission.comments.replace_more(limit=1)
+        return self.comment_sampler.sample(submission.comments)
+
+    def _paginate(self, listing):
+        """逐条迭代列表，每翻一页前节流"""
+        iterator = iter(listing)
+        count = 0
+        while True:
+            if count % PAGE_SIZE == 0:
+                self._throttle()
+            try:
+                submission = next(iterator)
+            except StopIteration:
+                return
+            count += 1
+            yield submission
+
+    def _build_post(self, submission, subreddit_name: str, post_time: datetime.datetime) -> Dict:
+        """由列表中的submission构建帖子数据字典"""
+        comments = []
+        cached = self.post_store.get(submission.id) if self.post_store else None
+        if cached is not None and cached["num_comments"] == submission.num_comments:
+            comments = cached["comments"]
+
+        return {
+            "id": submission.id,
+            "title": submission.title,
+            "content": submission.selftext if submission.selftext else "",
+            "author": str(getattr(submission.author, 'name', '[已删除]')),
+            "created": post_time.strftime("%Y-%m-%d %H:%M"),
+            "score": submission.score,
+            "comments": comments,
+            "comment_count": submission.num_comments,
+            "url": f"https://reddit.com{submission.permalink}",
+            "subreddit": subreddit_name,
+            "flair": submission.link_flair_text  # 新增flair字段
+        }
+
+    def _collect_listing(self, subreddit, spec: ListingSpec, posts: Dict[str, Dict]) -> bool:
+        """按计划拉取一个列表，结果按id合并进posts
+
+        返回是否已覆盖整个时间范围：new列表翻过cutoff才算覆盖，top列表本身按时间过滤。
+        """
+        if spec.kind == "new":
+            listing = subreddit.new(limit=spec.limit)
+        else:
+            listing = subreddit.top(time_filter=spec.time_filter, limit=spec.limit)
+        for submission in self._paginate(listing):
+            try:
+                post_time = datetime.datetime.fromtimestamp(submission.created_utc)
+                if post_time < spec.cutoff:
+                    if spec.kind == "new":
+                        # new列表按时间倒序，之后的帖子都更早，停止翻页
+                        return True
+                    continue
+                if submission.id not in posts:
+                    posts[submission.id] = self._build_post(submission, subreddit.display_name, post_time)
+            except Exception as e:
+                self.logger.warning(f"处理帖子 {submission.id} 时出错: {str(e)[:100]}")
+        return spec.kind != "new"
+
+    def fetch_listing(self, subreddit_name: str, time_ranges: Dict, max_posts: int = None,
+                      now: datetime.datetime = None) -> List[Dict]:
+        """第一阶段：只获取列表页中的帖子元数据，不拉取评论树
+
+        按plan_listings为各时间范围组合new/top列表，结果按id合并。
+        评论数(comment_count)取自submission.num_comments，可直接用于排序。
+        本地存储中评论数没有变化的帖子会顺带填入上次采集的评论，不产生额外请求。
+
         Args:
             subreddit_name: subreddit名称
             time_ranges: 时间范围字典
-            max_posts: 最大帖子数(可选)，如果未提供则获取所有符合条件的帖子
+            max_posts: 每个时间范围的top列表最多获取的帖子数(可选)
+            now: 构建time_ranges时使用的时间，用于选择top列表的时间过滤器
         """
-        posts = []
+        posts = {}
         try:
             subreddit = self.reddit.subreddit(subreddit_name)
             self.logger.info(f"开始获取 r/{subreddit_name} 的内容...")
-            
-            post_count = 0
-            for submission in subreddit.hot(limit=100):
-                try:
-                    post_time = datetime.datetime.fromtimestamp(submission.created_utc)
-                    if post_time < time_ranges["month"]:
-                        continue
-                        
-                    if max_posts is not None and post_count >= max_posts:
-                        break
-                        
-                    # 处理评论
-                    submission.comments.replace_more(limit=1)
-                    comments = []
-                    for comment in submission.comments.list()[:20]:  # 最多20条评论
-                        if isinstance(comment, praw.models.Comment):  # 确保是评论对象
-                            comments.append(f"{getattr(comment.author, 'name', '[已删除]')}: {comment.body[:300]}")
-
-                    # 构建帖子数据字典
-                    post = {
-                        "id": submission.id,
-                        "title": submission.title,
-                        "content": submission.selftext if submission.selftext else "",
-                        "author": str(getattr(submission.author, 'name', '[已删除]')),
-                        "created": post_time.strftime("%Y-%m-%d %H:%M"),
-                        "score": submission.score,
-                        "comments": comments,
-                        "comment_count": len(comments),
-                        "url": f"https://reddit.com{submission.permalink}",
-                        "subreddit": subreddit_name,
-                        "flair": submission.link_flair_text  # 新增flair字段
-                    }
-                    posts.append(post)
-                    post_count += 1
-                    time.sleep(0.5)
-                    
-                except Exception as e:
-                    self.logger.warning(f"处理帖子 {submission.id} 时出错: {str(e)[:100]}")
-                    time.sleep(1)
+
+            plans = plan_listings(time_ranges, max_posts or DEFAULT_POSTS_PER_WINDOW, now)
+            for spec in plans:
+                covered = self._collect_listing(subreddit, spec, posts)
+                if not covered and spec.fallback is not None:
+                    self.logger.info(f"r/{subreddit_name} 的 {spec} 未覆盖{spec.window}范围，改用 {spec.fallback}")
+                    self._collect_listing(subreddit, spec.fallback, posts)
             
             self.logger.info(f"从 r/{subreddit_name} 获取了 {len(posts)} 条帖子")
-            return posts
+            return list(posts.values())
             
         except Exception as e:
             self.logger.error(f"获取subreddit {subreddit_name} 时出错: {str(e)[:200]}")
-            return []
\ No newline at end of file
+            return list(posts.values())
+
+    def _hydrate_post(self, post: Dict):
+        """为单个帖子填充评论"""
+        try:
+            cached = self.post_store.get(post["id"]) if self.post_store else None
+            if cached is not None and cached["num_comments"] == post["comment_count"]:
+                post["comments"] = cached["comments"]
+            else:
+                submission = self.reddit.submission(id=post["id"])
+                post["comments"] = self._fetch_comments(submission)
+            if self.post_store:
+                self.post_store.save(post, post["comment_count"])
+        except Exception as e:
+            self.logger.warning(f"获取帖子 {post['id']} 的评论时出错: {str(e)[:100]}")
+
+    def _refresh_batch(self, batch: List[Dict]) -> List[Dict]:
+        """用一次reddit.info请求刷新一批帖子"""
+        by_id = {p["id"]: p for p in batch}
+        refreshed = []
+        try:
+            self._throttle()
+            for submission in self.reddit.info(fullnames=[f"t3_{post_id}" for post_id in by_id]):
+                post = by_id.get(submission.id)
+                if post is None:
+                    continue
+                post["score"] = submission.score
+                post["comment_count"] = submission.num_comments
+                if self.post_store:
+                    self.post_store.update_stats(post["id"], post["score"], post["comment_count"])
+                refreshed.append(post)
+        except Exception as e:
+            self.logger.warning(f"批量刷新帖子时出错: {str(e)[:100]}")
+        return refreshed
+
+    def refresh_posts(self, posts: List[Dict]) -> List[Dict]:
+        """通过reddit.info批量刷新已有帖子的评分和评论数(原地更新)
+
+        每次请求最多查询100个fullname，远少于逐个subreddit重新抓取的请求数；
+        各批次轮流分配给凭据池中的凭据并发执行。返回刷新成功的帖子。
+        """
+        unique = list({p["id"]: p for p in posts}.values())
+        batches = [unique[i:i + INFO_BATCH_SIZE] for i in range(0, len(unique), INFO_BATCH_SIZE)]
+        refreshed = []
+        with ThreadPoolExecutor(max_workers=len(self.credentials)) as executor:
+            futures = [
+                executor.submit(self._run_with, self.credentials[i % len(self.credentials)],
+                                self._refresh_batch, batch)
+                for i, batch in enumerate(batches)
+            ]
+            for future in futures:
+                refreshed.extend(future.result())
+        self.logger.info(f"批量刷新了 {len(refreshed)}/{len(posts)} 条帖子的评分")
+        return refreshed
+
+    def _refresh_known(self, listings: Dict[str, List[Dict]], time_ranges: Dict):
+        """把之前采集过、本次列表中没有出现的帖子批量刷新后并入各subreddit的帖子列表
+
+        所有subreddit的帖子合在一起调用refresh_posts，每100个帖子只需一次reddit.info请求。
+        """
+        fetched_ids = {p["id"] for posts in listings.values() for p in posts}
+        # 存储中的subreddit取自display_name，大小写可能与subreddits.txt不同
+        names = {name.lower(): name for name in listings}
+        known = [
+            p for p in self.post_store.load_since(time_ranges["month"].strftime("%Y-%m-%d %H:%M"))
+            if (p.get("subreddit") or "").lower() in names and p["id"] not in fetched_ids
+        ]
+        for post in self.refresh_posts(known):
+            listings[names[post["subreddit"].lower()]].append(post)
+
+    def _fetch_listings(self, executor: ThreadPoolExecutor, subreddits: List[Dict], time_ranges: Dict,
+                        now: datetime.datetime = None) -> Dict[str, List[Dict]]:
+        """在executor上并发获取各subreddit的列表元数据，返回subreddit名称 -> 帖子列表"""
+        futures = {
+            executor.submit(self._run_with, self._shards[s["name"]], self.fetch_listing,
+                            s["name"], time_ranges, s["weight"], now): s
+            for s in subreddits
+        }
+        listings = {}
+        for future in as_completed(futures):
+            subreddit = futures[future]
+            listings[subreddit["name"]] = future.result()
+            budget = self.rate_budget()
+            self.logger.info(f"r/{subreddit['name']} 列表获取完成，剩余请求配额: {budget['remaining']}")
+        return listings
+
+    def iter_fetch(self, subreddits: List[Dict], time_ranges: Dict, max_workers: int = 4,
+                   refresh_known: bool = False, select=None, now: datetime.datetime = None):
+        """并发获取多个subreddit，逐个产出(subreddit, 帖子列表)
+
+        第一阶段并发获取所有subreddit的列表元数据，可选地把之前采集过的帖子一起批量刷新；
+        全部完成后select在所有帖子的排名字段(见ranking_key)中统一挑选一次，
+        第二阶段只为挑中的帖子拉取评论。subreddit按其排名最高的入选帖子排序，依次产出，
+        每个subreddit内入选的帖子按排名排在最前；产出后即不再持有该subreddit的帖子。
+        select为None时为所有帖子拉取评论。
+
+        subreddit按权重分片到凭据池中的各组凭据，同一凭据的工作线程共享其令牌桶，
+        无需各自固定休眠。max_workers为每组凭据的并发线程数。
+
+        Args:
+            subreddits: load_subreddits返回的subreddit列表，权重即每个时间范围获取的帖子数
+            time_ranges: 时间范围字典
+            refresh_known: 是否把之前采集过、本次列表中没有出现的帖子批量刷新后一并返回
+            select: 从排名字段列表中挑出需要评论的帖子，返回其中的一部分
+            now: 构建time_ranges时使用的时间
+        """
+        self._shards = shard_subreddits(subreddits, self.credentials)
+        if len(self.credentials) > 1:
+            for i, credential in enumerate(self.credentials):
+                names = [name for name, c in self._shards.items() if c is credential]
+                self.logger.info(f"凭据{i + 1}(权重{credential.weight})负责: {', '.join(names)}")
+
+        with ThreadPoolExecutor(max_workers=max_workers * len(self.credentials)) as executor:
+            listings = self._fetch_listings(executor, subreddits, time_ranges, now)
+            if refresh_known and self.post_store:
+                self._refresh_known(listings, time_ranges)
+
+            # 挑选只需要排名字段，不保留帖子本身的引用
+            keys = [ranking_key(p) for s in subreddits for p in listings[s["name"]]]
+            selected = keys if select is None else select(keys)
+            rank = {k["id"]: i for i, k in enumerate(selected)}
+            self.logger.info(f"在 {len(keys)} 条帖子中挑选出 {len(rank)} 条拉取评论")
+            del keys, selected
+
+            # 入选帖子排名越靠前的subreddit越先拉取评论和产出
+            ordered = sorted(subreddits, key=lambda s: min(
+                (rank[p["id"]] for p in listings[s["name"]] if p["id"] in rank), default=len(rank)))
+            hydrations = deque(
+                (s, [executor.submit(self._run_with, self._shards[s["name"]], self._hydrate_post, p)
+                     for p in listings[s["name"]] if p["id"] in rank])
+                for s in ordered
+            )
+            while hydrations:
+                subreddit, pending = hydrations.popleft()
+                for future in pending:
+                    future.result()
+                posts = listings.pop(subreddit["name"])
+                chosen = sorted((p for p in posts if p["id"] in rank), key=lambda p: rank[p["id"]])
+                rest = [p for p in posts if p["id"] not in rank]
+                del pending, posts
+                yield subreddit, chosen + rest
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict
+import requests
+from requests.structures import CaseInsensitiveDict
+from prawcore import Requestor
+
+# 正文已解压保存，回放时不能再带这些响应头
+SKIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+# 获取token的请求包含凭据且每次不同，录制和回放时只按方法和URL匹配
+TOKEN_URL_SUFFIX = "/api/v1/access_token"
+
+# 录制信息文件名
+META_FILE = "meta.json"
+
+logger = logging.getLogger(__name__)
+
+# 本进程中已写入录制信息的目录；每个线程都会创建自己的praw实例和requestor，录制信息只写一次
+_meta_written = set()
+_meta_lock = threading.Lock()
+
+def request_key(method: str, url: str, params=None, data=None) -> str:
+    """根据请求内容计算录制文件的键"""
+    parts = [method.upper(), url]
+    if not url.endswith(TOKEN_URL_SUFFIX):
+        if params:
+            items = params.items() if isinstance(params, dict) else params
+            parts.append(json.dumps(sorted((str(k), str(v)) for k, v in items)))
+        if data:
+            items = data.items() if isinstance(data, dict) else data
+            parts.append(json.dumps(sorted((str(k), str(v)) for k, v in items)))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+class TransportStats:
+    """录制/回放期间的请求计数，多个praw实例共享"""
+
+    def __init__(self):
+        self.requests = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, miss: bool = False):
+        with self._lock:
+            self.requests += 1
+            if miss:
+                self.misses += 1
+
+class ReplayRateLimit:
+    """回放时模拟Reddit的限流响应头，多个praw实例共享同一份配额"""
+
+    def __init__(self, quota: int = 600, window: int = 600):
+        self.quota = quota
+        self.window = window
+        self._used = 0
+        self._window_start = time.time()
+        self._lock = threading.Lock()
+
+    def headers(self) -> Dict[str, str]:
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._used = 0
+            self._used += 1
+            return {
+                "x-ratelimit-used": str(self._used),
+                "x-ratelimit-remaining": str(max(0, self.quota - self._used)),
+                "x-ratelimit-reset": str(int(self._window_start + self.window - now))
+            }
+
+class RecordingRequestor(Requestor):
+    """透传到Reddit的同时把原始响应保存到磁盘"""
+
+    def __init__(self, *args, cassette_dir: str, stats: TransportStats = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cassette_dir = cassette_dir
+        self.stats = stats or TransportStats()
+        os.makedirs(cassette_dir, exist_ok=True)
+        # 记录录制时间，回放时据此重建相同的时间范围
+        with _meta_lock:
+            key = os.path.abspath(cassette_dir)
+            if key not in _meta_written:
+                _meta_written.add(key)
+                with open(os.path.join(cassette_dir, META_FILE), "w", encoding="utf-8") as f:
+                    json.dump({"recorded_at": time.time()}, f)
+
+    def request(self, method, url, *args, **kwargs):
+        response = super().request(method, url, *args, **kwargs)
+        self.stats.record()
+        key = request_key(method, url, kwargs.get("params"), kwargs.get("data"))
+        entry = {
+            "method": method.upper(),
+            "url": url,
+            "params": kwargs.get("params"),
+            "status": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in SKIPPED_HEADERS},
+            "body": response.content.decode("utf-8", errors="replace")
+        }
+        path = os.path.join(self.cassette_dir, f"{key}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return response
+
+class ReplayRequestor(Requestor):
+    """从磁盘回放录制的响应，不访问网络
+
+    Args:
+        cassette_dir: 录制文件目录
+        latency: 每次请求模拟的网络延迟(秒)
+        rate_limit: 模拟限流响应头的共享配额，为None时使用录制时的响应头
+    """
+
+    def __init__(self, *args, cassette_dir: str, latency: float = 0.0,
+                 rate_limit: ReplayRateLimit = None, stats: TransportStats = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cassette_dir = cassette_dir
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.stats = stats or TransportStats()
+
+    def request(self, method, url, *args, **kwargs):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        key = request_key(method, url, kwargs.get("params"), kwargs.get("data"))
+        path = os.path.join(self.cassette_dir, f"{key}.json")
+
+        response = requests.Response()
+        response.url = url
+        response.encoding = "utf-8"
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            response.status_code = entry["status"]
+            response.headers = CaseInsensitiveDict(entry["headers"])
+            response._content = entry["body"].encode("utf-8")
+            self.stats.record()
+        else:
+            logger.warning(f"未找到录制的响应: {method.upper()} {url} {kwargs.get('params')}")
+            response.status_code = 404
+            response.headers = CaseInsensitiveDict({"content-type": "application/json"})
+            response._content = b"{}"
+            self.stats.record(miss=True)
+        if self.rate_limit is not None:
+            response.headers.update(self.rate_limit.headers())
+        return response
+
+def recorded_at(cassette_dir: str):
+    """返回录制时的UTC时间戳，没有录制信息时返回None"""
+    path = os.path.join(cassette_dir, META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("recorded_at")
+
+def requestor_options(mode: str, cassette_dir: str, latency: float = 0.0,
+                      rate_limit_quota: int = 600, rate_limit_window: int = 600,
+                      stats: TransportStats = None) -> Dict:
+    """返回传给praw.Reddit的requestor参数
+
+    Args:
+        mode: live(直连)、record(录制)或replay(回放)
+        cassette_dir: 录制文件目录
+        latency: 回放时每次请求的模拟延迟(秒)
+        rate_limit_quota: 回放时模拟的每个窗口请求配额
+        rate_limit_window: 回放时模拟的配额窗口长度(秒)
+        stats: 共享的请求计数
+    """
+    if mode == "record":
+        return {
+            "requestor_class": RecordingRequestor,
+            "requestor_kwargs": {"cassette_dir": cassette_dir, "stats": stats}
+        }
+    if mode == "replay":
+        return {
+            "requestor_class": ReplayRequestor,
+            "requestor_kwargs": {
+                "cassette_dir": cassette_dir,
+                "latency": latency,
+                "rate_limit": ReplayRateLimit(rate_limit_quota, rate_limit_window),
+                "stats": stats
+            }
+        }
+    return {}
@@ -0,0 +1,150 @@
+import datetime
+import hashlib
+import os
+import threading
+import logging
+import numpy as np
+from typing import Dict, List
+from ranking import PostFrame, to_timestamp
+
+# 每条快照20字节：帖子id的哈希、采集时间(秒)、评分、评论数
+SNAPSHOT_DTYPE = np.dtype([("key", "<u8"), ("ts", "<u4"), ("score", "<i4"), ("comments", "<i4")])
+
+def post_key(post_id: str) -> int:
+    """帖子id的64位哈希"""
+    return int.from_bytes(hashlib.blake2b(post_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+class SnapshotStore:
+    """只追加的帖子评分/评论数时间序列
+
+    每次采集把所有帖子的评分和评论数作为定长记录追加到文件末尾，读取时整个文件
+    直接载入为numpy结构化数组，按帖子分组后向量化计算增速和加速度。
+    compact()按保留天数和每个帖子的最大快照数重写文件，保持文件小而快。
+
+    Args:
+        path: 快照文件路径
+        retention_days: 快照保留天数
+        max_per_post: 每个帖子最多保留的快照数
+    """
+
+    def __init__(self, path: str = os.path.join("reports", "snapshots.bin"), retention_days: int = 30,
+                 max_per_post: int = 48):
+        db_dir = os.path.dirname(path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.path = path
+        self.retention_days = retention_days
+        self.max_per_post = max_per_post
+        self._lock = threading.Lock()
+        self._cache = None
+        self.logger = logging.getLogger(__name__)
+
+    def record(self, posts: List[Dict], collected_at: datetime.datetime = None):
+        """追加一批帖子的快照"""
+        if not posts:
+            return
+        ts = int(to_timestamp(collected_at or datetime.datetime.utcnow()))
+        records = np.zeros(len(posts), dtype=SNAPSHOT_DTYPE)
+        records["key"] = [post_key(p["id"]) for p in posts]
+        records["ts"] = ts
+        records["score"] = [p.get("score", 0) or 0 for p in posts]
+        records["comments"] = [p.get("comment_count", 0) or 0 for p in posts]
+        with self._lock:
+            with open(self.path, "ab") as f:
+                records.tofile(f)
+
+    def load(self) -> np.ndarray:
+        """读取全部快照，按(帖子, 时间)排序；文件未变化时复用上次的结果"""
+        with self._lock:
+            if not os.path.exists(self.path):
+                return np.zeros(0, dtype=SNAPSHOT_DTYPE)
+            stat = os.stat(self.path)
+            key = (stat.st_mtime_ns, stat.st_size)
+            if self._cache is not None and self._cache[0] == key:
+                return self._cache[1]
+            # 中断时可能留下不完整的最后一条记录
+            count = stat.st_size // SNAPSHOT_DTYPE.itemsize
+            data = np.fromfile(self.path, dtype=SNAPSHOT_DTYPE, count=count)
+            data = data[np.lexsort((data["ts"], data["key"]))]
+            self._cache = (key, data)
+            return data
+
+    def kinematics(self, post_ids: List[str]) -> Dict[str, np.ndarray]:
+        """计算帖子最近的互动增速和加速度
+
+        互动量为评分+评论数。velocity为最近两次快照之间每小时的增量，
+        acceleration为最近两个区间增速的变化(每小时²)。快照不足时为NaN。
+        返回与post_ids对齐的velocity和acceleration数组。
+        """
+        data = self.load()
+        velocity = np.full(len(post_ids), np.nan)
+        acceleration = np.full(len(post_ids), np.nan)
+        if len(data) == 0 or not post_ids:
+            return {"velocity": velocity, "acceleration": acceleration}
+
+        keys, starts, counts = np.unique(data["key"], return_index=True, return_counts=True)
+        engagement = data["score"].astype(float) + data["comments"]
+        hours = data["ts"].astype(float) / 3600
+
+        wanted = np.array([post_key(i) for i in post_ids], dtype="<u8")
+        pos = np.searchsorted(keys, wanted)
+        pos = np.minimum(pos, len(keys) - 1)
+        found = keys[pos] == wanted
+        last = starts[pos] + counts[pos] - 1
+        n = np.where(found, counts[pos], 0)
+
+        has_two = n >= 2
+        prev = np.where(has_two, last - 1, last)
+        dt = hours[last] - hours[prev]
+        ok = has_two & (dt > 0)
+        velocity[ok] = (engagement[last] - engagement[prev])[ok] / dt[ok]
+
+        has_three = ok & (n >= 3)
+        prev2 = np.where(has_three, last - 2, prev)
+        dt_prev = hours[prev] - hours[prev2]
+        ok3 = has_three & (dt_prev > 0)
+        prev_velocity = np.zeros(len(post_ids))
+        prev_velocity[ok3] = (engagement[prev] - engagement[prev2])[ok3] / dt_prev[ok3]
+        span = (hours[last] - hours[prev2]) / 2
+        acceleration[ok3] = (velocity[ok3] - prev_velocity[ok3]) / span[ok3]
+        return {"velocity": velocity, "acceleration": acceleration}
+
+    def compact(self, now: datetime.datetime = None):
+        """丢弃超过保留天数的快照，每个帖子只保留最近max_per_post条，原子地重写文件"""
+        data = self.load()
+        if len(data) == 0:
+            return
+        cutoff = to_timestamp((now or datetime.datetime.utcnow()) - datetime.timedelta(days=self.retention_days))
+        keep = data["ts"] >= cutoff
+        # 数据已按(帖子, 时间)排序，同一帖子内从后往前数的序号不超过上限的保留
+        _, starts, counts = np.unique(data["key"], return_index=True, return_counts=True)
+        ends = np.repeat(starts + counts, counts)
+        keep &= (ends - np.arange(len(data))) <= self.max_per_post
+        if keep.all():
+            return
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            data[keep].tofile(tmp_path)
+            os.replace(tmp_path, self.path)
+            self._cache = None
+        self.logger.info(f"快照压缩: {len(data)} -> {int(keep.sum())} 条")
+
+    def __len__(self):
+        return len(self.load())
+
+
+def rising_scorer(store: SnapshotStore = None, horizon_hours: float = 1.0):
+    """返回"上升最快"的打分函数，供ranking使用
+
+    得分为按最近增速和加速度外推horizon_hours小时后的每小时互动量；
+    快照不足的帖子退回到整个生命周期的平均增速。
+    """
+    def score(frame: PostFrame, now: datetime.datetime) -> np.ndarray:
+        lifetime = (frame.score + frame.comment_count) / frame.age_hours(now)
+        if store is None:
+            return lifetime
+        kinematics = store.kinematics([p["id"] for p in frame.posts])
+        velocity = np.where(np.isnan(kinematics["velocity"]), lifetime, kinematics["velocity"])
+        acceleration = np.nan_to_num(kinematics["acceleration"])
+        return np.maximum(velocity + acceleration * horizon_hours, 0)
+    return score
@@ -0,0 +1,39 @@
+import os
+import sqlite3
+import threading
+import logging
+from typing import Tuple
+
+class SQLiteStore:
+    """基于SQLite的本地存储的公共部分
+
+    多个线程共享同一个连接，由锁串行化访问；开启WAL，读写不互相阻塞。
+    子类在SCHEMA中列出建表和建索引语句，需要额外初始化时重写_init_schema。
+
+    Args:
+        db_path: SQLite数据库路径，所在目录不存在时自动创建
+    """
+
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, db_path: str):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(type(self).__module__)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._init_schema()
+            self._conn.commit()
+
+    def _init_schema(self):
+        """建表，调用时已持有锁"""
+        for statement in self.SCHEMA:
+            self._conn.execute(statement)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
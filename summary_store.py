@@ -0,0 +1,45 @@
+import os
+import time
+from typing import Dict, List
+from sqlite_store import SQLiteStore
+
+class SummaryStore(SQLiteStore):
+    """基于SQLite的每日subreddit摘要存储
+
+    以(日期, subreddit)为键保存每天map阶段生成的摘要。周/月趋势分析直接汇总
+    存下来的每日摘要，不必重新读取整个时间范围的原始数据。
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS summaries (
+            date TEXT,
+            subreddit TEXT,
+            summary TEXT,
+            post_count INTEGER,
+            updated_at REAL,
+            PRIMARY KEY (date, subreddit)
+        )""",
+    )
+
+    def __init__(self, db_path: str = os.path.join("reports", "summary_store.db")):
+        super().__init__(db_path)
+
+    def save(self, date: str, subreddit: str, summary: str, post_count: int):
+        """保存某天某个subreddit的摘要(date格式为"%Y-%m-%d")，同一天重复生成时覆盖"""
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO summaries (date, subreddit, summary, post_count, updated_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (date, subreddit, summary, post_count, time.time())
+            )
+            self._conn.commit()
+
+    def load_range(self, start_date: str, end_date: str) -> List[Dict]:
+        """加载[start_date, end_date]内的摘要，按日期和subreddit排序"""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT date, subreddit, summary, post_count FROM summaries
+                   WHERE date >= ? AND date <= ? ORDER BY date, subreddit""",
+                (start_date, end_date)
+            ).fetchall()
+        return [{"date": r[0], "subreddit": r[1], "summary": r[2], "post_count": r[3]} for r in rows]
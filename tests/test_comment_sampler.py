@@ -0,0 +1,42 @@
+import pytest
+
+praw = pytest.importorskip("praw")
+
+from comment_sampler import CommentSampler
+
+class FakeComment(praw.models.Comment):
+    """不依赖Reddit实例的评论"""
+
+    # 覆盖praw按需加载的replies属性
+    replies = ()
+
+    def __init__(self, score, body, replies=(), author="user"):
+        self.__dict__.update(_fetched=True, score=score, body=body, replies=list(replies),
+                             author=type("Author", (), {"name": author})())
+
+class FakeMoreComments:
+    """未展开的"更多评论"占位"""
+
+def test_keeps_top_k_by_score():
+    forest = [FakeComment(score, f"c{score}") for score in (5, 50, 1, 20, 30)]
+    assert CommentSampler(k=3).sample(forest) == ["user: c50", "user: c30", "user: c20"]
+
+def test_ties_keep_traversal_order():
+    forest = [FakeComment(1, "first"), FakeComment(1, "second"), FakeComment(1, "third")]
+    assert CommentSampler(k=2).sample(forest) == ["user: first", "user: second"]
+
+def test_depth_limit_and_skipped_nodes():
+    deep = FakeComment(100, "depth3", [FakeComment(1000, "depth4")])
+    forest = [
+        FakeComment(1, "top", [FakeComment(10, "depth2", [deep]), FakeMoreComments()]),
+        FakeComment(99, "[deleted]"),
+        FakeComment(98, "[removed]"),
+    ]
+    assert CommentSampler(k=10, max_depth=3).sample(forest) == ["user: depth3", "user: depth2", "user: top"]
+    assert CommentSampler(k=10, max_depth=1).sample(forest) == ["user: top"]
+
+def test_length_and_char_budget():
+    forest = [FakeComment(3, "a" * 50), FakeComment(2, "b" * 50), FakeComment(1, "c" * 5)]
+    sampler = CommentSampler(k=10, max_length=20, char_budget=50)
+    # 每条截断为"user: "+20个字符=26个字符，第二条超出预算后停止
+    assert sampler.sample(forest) == ["user: " + "a" * 20]
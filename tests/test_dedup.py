@@ -0,0 +1,48 @@
+from dedup import dedupe_posts, find_duplicate_groups
+
+def make_post(post_id, subreddit, title, content="", score=10, comment_count=5, url=None, comments=None):
+    return {"id": post_id, "subreddit": subreddit, "title": title, "content": content, "score": score,
+            "comment_count": comment_count, "url": url or f"https://reddit.com/r/{subreddit}/comments/{post_id}",
+            "comments": comments or []}
+
+LONG_TITLE = "New open weights model beats the previous release on every coding benchmark"
+
+def test_crosspost_is_merged():
+    posts = [
+        make_post("a", "LocalLLaMA", LONG_TITLE, score=100, comment_count=40, comments=["x", "y"]),
+        make_post("b", "MachineLearning", LONG_TITLE, score=30, comment_count=10, comments=["y", "z"]),
+        make_post("c", "LocalLLaMA", "Completely unrelated question about running inference on old GPUs"),
+    ]
+    merged = dedupe_posts(posts)
+    assert [p["id"] for p in merged] == ["a", "c"]
+    assert merged[0]["score"] == 130
+    assert merged[0]["comment_count"] == 50
+    assert merged[0]["comments"] == ["x", "y", "z"]
+
+def test_near_duplicate_is_merged():
+    posts = [
+        make_post("a", "LocalLLaMA", LONG_TITLE),
+        make_post("b", "singularity", LONG_TITLE + " today"),
+    ]
+    assert find_duplicate_groups(posts) == [[0, 1]]
+
+def test_templated_short_titles_are_not_merged():
+    posts = [
+        make_post("a", "LocalLLaMA", "Weekly Discussion Thread"),
+        make_post("b", "MachineLearning", "Weekly Discussion Thread"),
+        make_post("c", "LocalLLaMA", "Daily Questions"),
+        make_post("d", "singularity", "Daily Questions"),
+    ]
+    assert find_duplicate_groups(posts) == []
+    assert dedupe_posts(posts) == posts
+
+def test_short_titles_with_same_url_are_merged():
+    url = "https://reddit.com/r/LocalLLaMA/comments/a"
+    posts = [
+        make_post("a", "LocalLLaMA", "Daily Questions", score=5, url=url),
+        make_post("a", "LocalLLaMA", "Daily Questions", score=7, url=url),
+        make_post("c", "singularity", "Daily Questions"),
+    ]
+    assert find_duplicate_groups(posts) == [[0, 1]]
+    # 同一个帖子的两份记录不能重复累加评分
+    assert [p["score"] for p in dedupe_posts(posts)] == [7, 10]
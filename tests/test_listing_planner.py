@@ -0,0 +1,34 @@
+import datetime
+from listing_planner import plan_listings, time_filter_for
+from ranking import build_time_ranges
+
+NOW = datetime.datetime(2026, 10, 18, 12, 0)
+
+def filters_by_window(plans):
+    filters = {}
+    for spec in plans:
+        top = spec if spec.kind == "top" else spec.fallback
+        filters[spec.window] = top.time_filter
+    return filters
+
+def test_windows_map_to_nominal_filters_with_run_now():
+    plans = plan_listings(build_time_ranges(NOW), 25, now=NOW)
+    assert filters_by_window(plans) == {"24h": "day", "week": "week", "month": "month"}
+
+def test_windows_map_to_nominal_filters_when_planned_later():
+    # 构建time_ranges之后过了几分钟才规划列表
+    later = NOW + datetime.timedelta(minutes=10)
+    plans = plan_listings(build_time_ranges(NOW), 25, now=later)
+    assert filters_by_window(plans) == {"24h": "day", "week": "week", "month": "month"}
+
+def test_shortest_window_uses_new_listing_first():
+    plans = plan_listings(build_time_ranges(NOW), 25, now=NOW)
+    assert plans[0].window == "24h"
+    assert plans[0].kind == "new"
+    assert [spec.kind for spec in plans[1:]] == ["top", "top"]
+
+def test_time_filter_for_spans():
+    assert time_filter_for(datetime.timedelta(hours=24)) == "day"
+    assert time_filter_for(datetime.timedelta(days=2)) == "week"
+    assert time_filter_for(datetime.timedelta(days=7)) == "week"
+    assert time_filter_for(datetime.timedelta(days=400)) == "all"
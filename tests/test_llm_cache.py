@@ -0,0 +1,49 @@
+import pytest
+import llm_cache
+from llm_cache import LLMCache
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        self.now += 1
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return clock
+
+def test_key_depends_on_model_params_and_prompt():
+    key = LLMCache.make_key("model", {"max_tokens": 10, "base_url": "x"}, "prompt")
+    # 参数顺序不影响键
+    assert key == LLMCache.make_key("model", {"base_url": "x", "max_tokens": 10}, "prompt")
+    assert key != LLMCache.make_key("other", {"max_tokens": 10, "base_url": "x"}, "prompt")
+    assert key != LLMCache.make_key("model", {"max_tokens": 11, "base_url": "x"}, "prompt")
+    assert key != LLMCache.make_key("model", {"max_tokens": 10, "base_url": "x"}, "prompt ")
+
+def test_hit_and_miss(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.db"))
+    assert cache.get("k") is None
+    cache.put("k", "response")
+    assert cache.get("k") == "response"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+def test_expired_entries_miss(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "llm.db"), ttl=100)
+    cache.put("k", "response")
+    clock.now += 50
+    assert cache.get("k") == "response"
+    clock.now += 100
+    assert cache.get("k") is None
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "llm.db"), max_entries=3)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+    assert cache.get("a") == "A"
+    cache.put("d", "D")
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["A", "C", "D"]
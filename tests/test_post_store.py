@@ -0,0 +1,43 @@
+from post_store import PostStore
+
+def make_post(post_id, subreddit="python", created="2026-10-18 08:00", score=10, comment_count=2, comments=None):
+    return {"id": post_id, "title": f"title {post_id}", "subreddit": subreddit, "created": created,
+            "score": score, "comment_count": comment_count, "comments": comments or ["a: hi", "b: hello"]}
+
+def test_save_and_get(tmp_path):
+    store = PostStore(str(tmp_path / "posts.db"))
+    assert store.get("missing") is None
+    store.save(make_post("a"), 2)
+    cached = store.get("a")
+    assert cached["num_comments"] == 2
+    assert cached["comments"] == ["a: hi", "b: hello"]
+    assert "comments" not in cached["data"]
+    assert cached["data"]["title"] == "title a"
+
+def test_update_stats_keeps_comment_snapshot(tmp_path):
+    store = PostStore(str(tmp_path / "posts.db"))
+    store.save(make_post("a"), 2)
+    store.update_stats("a", 50, 9)
+    cached = store.get("a")
+    assert cached["score"] == 50
+    assert cached["data"]["score"] == 50
+    assert cached["data"]["comment_count"] == 9
+    # 评论采集时的评论数不变，评论数变化后下次仍会重新拉取
+    assert cached["num_comments"] == 2
+
+def test_load_since_filters_by_time_and_subreddit(tmp_path):
+    store = PostStore(str(tmp_path / "posts.db"))
+    store.save(make_post("old", created="2026-09-01 00:00"), 2)
+    store.save(make_post("new", created="2026-10-17 00:00"), 2)
+    store.save(make_post("other", subreddit="rust", created="2026-10-17 00:00"), 2)
+    assert sorted(p["id"] for p in store.load_since("2026-10-01 00:00")) == ["new", "other"]
+    loaded = store.load_since("2026-10-01 00:00", "python")
+    assert [p["id"] for p in loaded] == ["new"]
+    assert loaded[0]["comments"] == ["a: hi", "b: hello"]
+
+def test_persists_across_reopen(tmp_path):
+    path = str(tmp_path / "nested" / "posts.db")
+    store = PostStore(path)
+    store.save(make_post("a"), 2)
+    store.close()
+    assert PostStore(path).get("a")["num_comments"] == 2
@@ -0,0 +1,109 @@
+import datetime
+import random
+import re
+import pytest
+from prompt_packer import PromptPacker
+from ranking import build_time_ranges, select_report_posts
+
+NOW = datetime.datetime(2026, 10, 18, 12, 0)
+
+def count_tokens(text):
+    return len(text) // 4 + 1
+
+def make_day(subreddits=11, per_subreddit=60, seed=7):
+    """合成的一天：各subreddit的帖子元数据，尚未拉取评论"""
+    rng = random.Random(seed)
+    posts = []
+    for s in range(subreddits):
+        for i in range(per_subreddit):
+            age = rng.uniform(0, 30 * 24)
+            posts.append({
+                "id": f"s{s}_{i}", "subreddit": f"sub{s}", "title": f"post {i} in sub{s} " + "t" * rng.randint(0, 200),
+                "content": "x" * rng.choice([0, 0, rng.randint(1, 3000)]), "author": "a",
+                "created": (NOW - datetime.timedelta(hours=age)).strftime("%Y-%m-%d %H:%M"),
+                "score": rng.randint(0, 5000), "comment_count": rng.randint(1, 800) if rng.random() < 0.9 else 0,
+                "comments": [], "url": f"https://reddit.com/s{s}_{i}"
+            })
+    return posts
+
+def metadata(post):
+    """与reddit_client.ranking_key一致的排名字段"""
+    key = {field: post[field] for field in ("id", "subreddit", "created", "score", "comment_count", "title")}
+    key["content_length"] = len(post["content"])
+    return key
+
+def hydrate(posts, ids, seed=11):
+    rng = random.Random(seed)
+    for post in posts:
+        if post["id"] in ids:
+            post["comments"] = [f"user{j}: " + "c" * rng.randint(1, 300) for j in range(min(post["comment_count"], 20))]
+
+def packed_blocks(text):
+    return [block for block in text.split("\n\n") if block.strip()]
+
+def missing_comments(blocks):
+    """有评论数却没有评论的帖子块"""
+    return [b for b in blocks if int(re.search(r"评论数: (\d+)", b).group(1)) > 0 and "【热门评论】" not in b]
+
+def test_estimate_is_not_below_rendered_size():
+    packer = PromptPacker(count_tokens)
+    for post in make_day(subreddits=2):
+        estimate = packer.estimate_tokens(metadata(post))
+        post["comments"] = ["u: " + "c" * 400] * min(post["comment_count"], 20)
+        assert estimate >= count_tokens(packer.render(post) + "\n")
+
+def test_pack_skips_posts_without_fetched_comments():
+    packer = PromptPacker(count_tokens)
+    posts = [
+        {"id": "a", "title": "no comments fetched", "created": "2026-10-18 11:00", "score": 900,
+         "comment_count": 300, "comments": [], "subreddit": "x"},
+        {"id": "b", "title": "quiet post", "created": "2026-10-18 11:00", "score": 5,
+         "comment_count": 0, "comments": [], "subreddit": "x"},
+        {"id": "c", "title": "hydrated", "created": "2026-10-18 11:00", "score": 10,
+         "comment_count": 2, "comments": ["u: hi"], "subreddit": "x"},
+    ]
+    text = packer.pack(posts, NOW)
+    assert "no comments fetched" not in text
+    assert "quiet post" in text and "hydrated" in text
+
+def test_every_packed_post_carries_comments():
+    packer = PromptPacker(count_tokens, token_budget=4000)
+    posts = make_day()
+    keys = [metadata(p) for p in posts]
+    tables = select_report_posts(keys, build_time_ranges(NOW))
+    prompt = packer.select(keys, NOW)
+    hydrate(posts, {k["id"] for k in tables + prompt})
+
+    blocks = packed_blocks(packer.pack(posts, NOW))
+    assert len(blocks) >= len(prompt) > 0
+    assert missing_comments(blocks) == []
+
+def test_analyzer_selects_table_and_prompt_posts(tmp_path, monkeypatch):
+    pytest.importorskip("langchain_openai")
+    from llm_analyzer import LLMAnalyzer
+    from llm_cache import LLMCache
+    from summary_store import SummaryStore
+
+    def make_analyzer(mode):
+        monkeypatch.setenv("LLM_ANALYSIS_MODE", mode)
+        analyzer = LLMAnalyzer(api_key="test", model_name="test", base_url="http://127.0.0.1:9",
+                               cache=LLMCache(str(tmp_path / f"{mode}_llm.db")),
+                               summary_store=SummaryStore(str(tmp_path / f"{mode}_summary.db")))
+        analyzer.packer.count_tokens = count_tokens
+        return analyzer
+
+    posts = make_day()
+    keys = [metadata(p) for p in posts]
+    time_ranges = build_time_ranges(NOW)
+    analyzer = make_analyzer("single")
+    selected = analyzer.select_posts(keys, time_ranges, NOW)
+    assert len({k["id"] for k in selected}) == len(selected)
+    hydrate(posts, {k["id"] for k in selected})
+    blocks = packed_blocks(analyzer.packer.pack(posts, NOW))
+    assert blocks
+    assert missing_comments(blocks) == []
+
+    # map_reduce模式不使用提示词打包，只为表格中的帖子拉取评论
+    tables = make_analyzer("map_reduce").select_posts(keys, time_ranges, NOW)
+    assert len(tables) < len(selected)
+    assert [k["id"] for k in selected[:len(tables)]] == [k["id"] for k in tables]
@@ -0,0 +1,81 @@
+import datetime
+import random
+import numpy as np
+from ranking import PostFrame, frame_for, select_top_posts, top_k
+
+NOW = datetime.datetime(2026, 10, 18, 12, 0)
+
+def make_post(post_id, hours_ago, comment_count, score=0, subreddit="LocalLLaMA"):
+    created = None if hours_ago is None else (NOW - datetime.timedelta(hours=hours_ago)).strftime("%Y-%m-%d %H:%M")
+    return {"id": post_id, "created": created, "comment_count": comment_count, "score": score,
+            "subreddit": subreddit}
+
+TIME_RANGES = {
+    "24h": NOW - datetime.timedelta(hours=24),
+    "week": NOW - datetime.timedelta(days=7),
+    "month": NOW - datetime.timedelta(days=30),
+}
+
+def stable_top(keys, candidates, k):
+    return sorted(candidates, key=lambda i: -keys[i])[:k]
+
+def test_top_k_matches_stable_sort_with_ties():
+    rng = random.Random(0)
+    for _ in range(200):
+        n = rng.randint(0, 60)
+        # 取值范围很小，保证有大量并列
+        keys = np.array([rng.randint(0, 5) for _ in range(n)], dtype=float)
+        candidates = np.array(sorted(rng.sample(range(n), rng.randint(0, n))), dtype=int)
+        k = rng.randint(0, 12)
+        assert top_k(keys, candidates, k).tolist() == stable_top(keys, candidates.tolist(), k)
+
+def test_top_k_all_tied_keeps_original_order():
+    keys = np.ones(10)
+    assert top_k(keys, np.arange(10), 4).tolist() == [0, 1, 2, 3]
+
+def test_missing_created_is_excluded_from_every_window():
+    posts = [make_post("a", 2, 5), make_post("bad", None, 1000), make_post("b", 100, 50)]
+    posts[1]["created"] = "not a date"
+    frame = PostFrame(posts)
+    assert np.isnan(frame.created[1])
+    assert not frame.window_mask(list(TIME_RANGES.values()))[:, 1].any()
+    top = select_top_posts(posts, TIME_RANGES, now=NOW)
+    assert [p["id"] for p in top["24h"]] == ["a"]
+    assert [p["id"] for p in top["week"]] == ["b", "a"]
+    # 按增速打分时发布时间缺失的帖子同样不参与排名
+    top = select_top_posts(posts, TIME_RANGES, scorer="velocity", now=NOW)
+    assert "bad" not in [p["id"] for window in top.values() for p in window]
+
+def test_select_top_posts_by_comments():
+    posts = [make_post(str(i), i * 10, i) for i in range(1, 40)]
+    top = select_top_posts(posts, TIME_RANGES, now=NOW)
+    assert [p["id"] for p in top["24h"]] == ["2", "1"]
+    assert len(top["week"]) == 7
+    assert [p["id"] for p in top["month"]] == ["39", "38", "37", "36", "35"]
+
+def test_frame_cache_reused_for_same_list():
+    posts = [make_post("a", 1, 1), make_post("b", 2, 2)]
+    assert frame_for(posts) is frame_for(posts)
+
+def test_frame_cache_not_stale_after_list_changes():
+    posts = [make_post("a", 1, 1), make_post("b", 2, 2)]
+    first = frame_for(posts)
+
+    posts.append(make_post("c", 3, 3))
+    appended = frame_for(posts)
+    assert appended is not first
+    assert appended.comment_count.tolist() == [1, 2, 3]
+
+    # 长度不变，替换其中一个帖子
+    posts[0] = make_post("d", 1, 100)
+    replaced = frame_for(posts)
+    assert replaced is not appended
+    assert replaced.comment_count.tolist() == [100, 2, 3]
+
+    posts.reverse()
+    assert frame_for(posts).comment_count.tolist() == [3, 2, 100]
+
+def test_frame_cache_keyed_by_weights():
+    posts = [make_post("a", 1, 1)]
+    assert frame_for(posts, {"LocalLLaMA": 20}).weight.tolist() == [2.0]
+    assert frame_for(posts).weight.tolist() == [1.0]
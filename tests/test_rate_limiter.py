@@ -0,0 +1,132 @@
+import pytest
+from rate_limiter import RateGovernor, TokenBucket
+
+class FakeClock:
+    """可控的时钟，sleep直接推进时间并记录每次等待"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def praw_limits(remaining, reset_timestamp, used=None):
+    """praw的auth.limits：首次请求前各项均为None"""
+    return {"remaining": remaining, "reset_timestamp": reset_timestamp, "used": used}
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def governor(clock):
+    return RateGovernor(reserve=20, clock=clock, sleep=clock.sleep)
+
+def test_limits_before_first_request_are_ignored(governor):
+    governor.update(praw_limits(None, None))
+    governor.update({})
+    assert governor.budget() == {"remaining": None, "used": None, "reset_timestamp": None, "reset_in": None}
+    governor.wait()
+    assert governor.budget()["remaining"] is None
+
+def test_first_limits_are_adopted(governor, clock):
+    governor.update(praw_limits(95.0, clock.now + 300, used=5))
+    assert governor.budget() == {"remaining": 95.0, "used": 5, "reset_timestamp": clock.now + 300, "reset_in": 300}
+
+def test_same_window_keeps_the_smaller_remaining(governor, clock):
+    reset = clock.now + 300
+    governor.update(praw_limits(50.0, reset, used=50))
+    # 其他线程先前发出的请求，返回得更晚，剩余值更大
+    governor.update(praw_limits(60.0, reset, used=40))
+    assert governor.budget()["remaining"] == 50.0
+    governor.update(praw_limits(45.0, reset, used=55))
+    assert governor.budget()["remaining"] == 45.0
+    assert governor.budget()["used"] == 55
+
+def test_shorter_reset_is_the_same_window(governor, clock):
+    reset = clock.now + 300
+    governor.update(praw_limits(50.0, reset))
+    # 同一窗口内按响应时间算出的重置时间可能略早或略晚(1秒以内)，不算新窗口
+    governor.update(praw_limits(90.0, reset - 5))
+    governor.update(praw_limits(90.0, reset + 0.5))
+    assert governor.budget()["remaining"] == 50.0
+    governor.update(praw_limits(30.0, reset - 5))
+    budget = governor.budget()
+    assert budget["remaining"] == 30.0
+    assert budget["reset_timestamp"] == reset
+
+def test_window_rollover_resets_the_budget(governor, clock):
+    governor.update(praw_limits(2.0, clock.now + 10, used=98))
+    clock.now += 11
+    governor.update(praw_limits(99.0, clock.now + 600, used=1))
+    budget = governor.budget()
+    assert budget["remaining"] == 99.0
+    assert budget["used"] == 1
+    assert budget["reset_in"] == 600
+
+def test_no_delay_above_reserve(governor, clock):
+    governor.update(praw_limits(21.0, clock.now + 100))
+    governor.wait()
+    assert clock.sleeps == []
+    assert governor.budget()["remaining"] == 20.0
+
+def test_delay_spreads_remaining_requests_until_reset(governor, clock):
+    governor.update(praw_limits(20.0, clock.now + 100))
+    governor.wait()
+    assert clock.sleeps == [pytest.approx(100 / 20)]
+    # 等待前已预扣一次请求，下一次按剩余19次分配剩下的95秒
+    governor.wait()
+    assert clock.sleeps[-1] == pytest.approx(95 / 19)
+
+def test_wait_reserves_several_requests(governor, clock):
+    governor.update(praw_limits(25.0, clock.now + 100))
+    governor.wait(2)
+    governor.wait(2)
+    assert clock.sleeps == []
+    assert governor.budget()["remaining"] == 21.0
+    governor.wait(2)
+    governor.wait(2)
+    assert clock.sleeps == [pytest.approx(100 / 19)]
+    assert governor.budget()["remaining"] == 17.0
+
+def test_exhausted_budget_waits_until_reset(governor, clock):
+    governor.update(praw_limits(0.5, clock.now + 40))
+    governor.wait()
+    assert clock.sleeps == [pytest.approx(40)]
+    assert governor.budget()["remaining"] == 0.0
+
+def test_past_reset_does_not_wait(governor, clock):
+    governor.update(praw_limits(0.0, clock.now + 10))
+    clock.now += 30
+    governor.wait()
+    assert clock.sleeps == []
+    assert governor.budget()["reset_in"] == 0.0
+
+def test_token_bucket_bursts_then_waits_for_refill(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+    assert bucket.available == pytest.approx(0.0)
+
+def test_token_bucket_refill_is_capped(clock):
+    bucket = TokenBucket(rate=1.0, capacity=60, clock=clock, sleep=clock.sleep)
+    bucket.acquire(60)
+    clock.now += 600
+    assert bucket.available == pytest.approx(60)
+    bucket.acquire(60)
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+def test_token_bucket_zero_rate_is_unlimited(clock):
+    bucket = TokenBucket(rate=0, capacity=1, clock=clock, sleep=clock.sleep)
+    for _ in range(100):
+        bucket.acquire()
+    assert clock.sleeps == []
@@ -0,0 +1,64 @@
+import datetime
+import json
+from raw_data import RawDataWriter, export_text, iter_posts, load_posts, read_header, to_text
+
+COLLECTED_AT = datetime.datetime(2026, 10, 18, 12, 0)
+
+def make_posts(subreddit, count):
+    return [{"id": f"{subreddit}_{i}", "title": f"post {i}", "subreddit": subreddit, "score": i,
+             "comment_count": i, "created": "2026-10-18 10:00", "comments": [f"comment {i}"]}
+            for i in range(count)]
+
+def test_resume_after_interrupted_write(tmp_path):
+    path = str(tmp_path / "reddit_raw.jsonl")
+    names = ["a", "b", "c"]
+    writer = RawDataWriter(path)
+    assert writer.start(names, COLLECTED_AT) == set()
+    writer.write_subreddit("a", make_posts("a", 3))
+
+    # 写入b时中断：写了一条完整记录和半条记录，检查点没有更新
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(dict(make_posts("b", 1)[0], type="post")) + "\n")
+        f.write('{"type": "post", "id": "b_1", "tit')
+
+    resumed = RawDataWriter(path)
+    assert not resumed.is_complete()
+    assert resumed.start(names, COLLECTED_AT) == {"a"}
+    for name in ("b", "c"):
+        resumed.write_subreddit(name, make_posts(name, 3))
+    resumed.finish()
+
+    ids = [post["id"] for post in iter_posts(path)]
+    assert ids == [f"{name}_{i}" for name in names for i in range(3)]
+    assert RawDataWriter(path).is_complete()
+    assert read_header(path)["subreddits"] == names
+
+def test_start_without_resume_discards_checkpoint(tmp_path):
+    path = str(tmp_path / "reddit_raw.jsonl")
+    writer = RawDataWriter(path)
+    writer.start(["a", "b"], COLLECTED_AT)
+    writer.write_subreddit("a", make_posts("a", 2))
+
+    restarted = RawDataWriter(path)
+    assert restarted.start(["a", "b"], COLLECTED_AT, resume=False) == set()
+    restarted.write_subreddit("b", make_posts("b", 2))
+    assert [post["id"] for post in iter_posts(path)] == ["b_0", "b_1"]
+
+def test_export_text_keeps_every_post(tmp_path):
+    path = str(tmp_path / "reddit_raw.jsonl")
+    writer = RawDataWriter(path)
+    writer.start(["a", "b"], COLLECTED_AT)
+    # 同一链接的转发，读取报告数据时会合并为一条
+    crosspost = {"title": "Big release announced today for everyone", "created": "2026-10-18 10:00",
+                 "url": "https://example.com/release", "comments": []}
+    writer.write_subreddit("a", [dict(crosspost, id="a_0", subreddit="a", score=10, comment_count=1)])
+    writer.write_subreddit("b", [dict(crosspost, id="b_0", subreddit="b", score=5, comment_count=2)])
+    writer.finish()
+    assert len(load_posts(path)) == 1
+
+    text_path = str(tmp_path / "reddit_raw.txt")
+    export_text(path, text_path)
+    with open(text_path, encoding="utf-8") as f:
+        text = f.read()
+    assert text == to_text(path)
+    assert [p["id"] for p in iter_posts(text_path)] == ["a_0", "b_0"]
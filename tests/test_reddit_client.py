@@ -0,0 +1,111 @@
+import datetime
+import pytest
+
+pytest.importorskip("praw")
+
+from post_store import PostStore
+from reddit_client import RANKING_FIELDS, RedditClient, parse_credentials
+
+def test_parse_credentials():
+    assert parse_credentials("id1:secret1, id2:secret2:3") == [
+        {"client_id": "id1", "client_secret": "secret1", "weight": 1},
+        {"client_id": "id2", "client_secret": "secret2", "weight": 3},
+    ]
+
+def test_parse_credentials_skips_malformed_entries():
+    value = "only_id, :secret, id:, a:b:c:d, id3:secret3:heavy, id4:secret4:0, id5:secret5:2,,"
+    assert parse_credentials(value) == [{"client_id": "id5", "client_secret": "secret5", "weight": 2}]
+
+def test_parse_credentials_empty():
+    assert parse_credentials(None) == []
+    assert parse_credentials("  ") == []
+
+def make_post(post_id, subreddit, comment_count, created="2026-10-18 08:00"):
+    return {"id": post_id, "title": f"title {post_id}", "content": "x" * 100, "author": "a",
+            "created": created, "score": comment_count, "comments": [], "comment_count": comment_count,
+            "url": f"https://reddit.com/{post_id}", "subreddit": subreddit, "flair": None}
+
+class FakeClient(RedditClient):
+    """列表、评论和批量刷新都在内存中完成的客户端"""
+
+    def __init__(self, listings, post_store=None):
+        super().__init__("id", "secret", "ua", post_store=post_store)
+        self.listings = listings
+        self.hydrated = []
+        self.refreshed = []
+
+    def fetch_listing(self, subreddit_name, time_ranges, max_posts=None, now=None):
+        return [dict(p) for p in self.listings[subreddit_name]]
+
+    def _hydrate_post(self, post):
+        self.hydrated.append(post["id"])
+        post["comments"] = [f"user: comment on {post['id']}"]
+
+    def refresh_posts(self, posts):
+        self.refreshed.append(sorted(p["id"] for p in posts))
+        for p in posts:
+            p["comment_count"] += 1000
+        return posts
+
+SUBREDDITS = [{"name": "a", "weight": 10}, {"name": "b", "weight": 10}, {"name": "c", "weight": 10}]
+LISTINGS = {
+    "a": [make_post("a1", "a", 5), make_post("a2", "a", 1)],
+    "b": [make_post("b1", "b", 50), make_post("b2", "b", 2)],
+    "c": [make_post("c1", "c", 0)],
+}
+
+def top_two(keys):
+    return sorted(keys, key=lambda k: k["comment_count"], reverse=True)[:2]
+
+def test_iter_fetch_selects_once_across_subreddits():
+    client = FakeClient(LISTINGS)
+    seen_keys = []
+
+    def select(keys):
+        seen_keys.extend(keys)
+        return top_two(keys)
+
+    results = list(client.iter_fetch(SUBREDDITS, {}, select=select))
+    # 选择只看到轻量的排名字段
+    assert all(set(k) == set(RANKING_FIELDS) | {"content_length"} for k in seen_keys)
+    assert seen_keys[0]["content_length"] == 100
+    assert len(seen_keys) == 5
+    assert sorted(client.hydrated) == ["a1", "b1"]
+    # 排名最高的入选帖子所在的subreddit先产出，入选帖子排在最前
+    assert [(s["name"], [p["id"] for p in posts]) for s, posts in results] == [
+        ("b", ["b1", "b2"]), ("a", ["a1", "a2"]), ("c", ["c1"])]
+    assert results[0][1][0]["comments"] == ["user: comment on b1"]
+    assert results[0][1][1]["comments"] == []
+
+def test_iter_fetch_without_select_hydrates_everything():
+    client = FakeClient(LISTINGS)
+    results = list(client.iter_fetch(SUBREDDITS, {}))
+    assert sorted(client.hydrated) == ["a1", "a2", "b1", "b2", "c1"]
+    assert [s["name"] for s, _ in results] == ["a", "b", "c"]
+
+def test_iter_fetch_releases_each_subreddit_after_yielding():
+    client = FakeClient(LISTINGS)
+    fetch = client.iter_fetch(SUBREDDITS, {}, select=top_two)
+    subreddit, _ = next(fetch)
+    assert subreddit["name"] == "b"
+    assert set(fetch.gi_frame.f_locals["listings"]) == {"a", "c"}
+    next(fetch)
+    assert set(fetch.gi_frame.f_locals["listings"]) == {"c"}
+
+def test_iter_fetch_refreshes_known_posts_in_one_batch(tmp_path):
+    store = PostStore(str(tmp_path / "posts.db"))
+    # 之前采集过、本次列表中没有出现的帖子；subreddit的大小写与subreddits.txt不同
+    store.save(make_post("a_old", "A", 3, created="2026-10-10 00:00"), 3)
+    store.save(make_post("b_old", "b", 4, created="2026-10-10 00:00"), 4)
+    store.save(make_post("too_old", "b", 4, created="2026-08-01 00:00"), 4)
+    store.save(make_post("elsewhere", "other", 4, created="2026-10-10 00:00"), 4)
+    store.save(make_post("b1", "b", 50), 50)
+    client = FakeClient(LISTINGS, post_store=store)
+    time_ranges = {"month": datetime.datetime(2026, 9, 18)}
+    results = dict((s["name"], [p["id"] for p in posts])
+                   for s, posts in client.iter_fetch(SUBREDDITS, time_ranges, refresh_known=True, select=top_two))
+    assert client.refreshed == [["a_old", "b_old"]]
+    # 刷新后评论数最多的两个已知帖子入选
+    assert sorted(client.hydrated) == ["a_old", "b_old"]
+    assert results["a"] == ["a_old", "a1", "a2"]
+    assert results["b"] == ["b_old", "b1", "b2"]
@@ -0,0 +1,87 @@
+import datetime
+import os
+import numpy as np
+import pytest
+from snapshot_store import SNAPSHOT_DTYPE, SnapshotStore, post_key
+
+T0 = datetime.datetime(2026, 10, 18, 0, 0)
+
+def snapshot(store, hours, stats):
+    """stats: 帖子id -> (评分, 评论数)"""
+    posts = [{"id": post_id, "score": score, "comment_count": comments} for post_id, (score, comments) in stats.items()]
+    store.record(posts, T0 + datetime.timedelta(hours=hours))
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path / "snapshots.bin"))
+
+def test_record_layout(store):
+    assert SNAPSHOT_DTYPE.itemsize == 20
+    snapshot(store, 0, {"a": (10, 2), "b": (5, 1)})
+    assert os.path.getsize(store.path) == 2 * 20
+    data = store.load()
+    assert sorted(data["key"].tolist()) == sorted([post_key("a"), post_key("b")])
+    assert set(data["ts"].tolist()) == {int((T0 - datetime.datetime(1970, 1, 1)).total_seconds())}
+
+def test_kinematics_by_snapshot_count(store):
+    # one: 1次快照；two: 2次；three: 3次，互动量(评分+评论数)为10、20、60
+    snapshot(store, 0, {"two": (5, 5), "three": (5, 5)})
+    snapshot(store, 1, {"two": (15, 5), "three": (15, 5)})
+    snapshot(store, 3, {"one": (1, 1), "three": (40, 20)})
+    result = store.kinematics(["one", "two", "three", "unknown"])
+    velocity, acceleration = result["velocity"], result["acceleration"]
+
+    assert np.isnan(velocity[0]) and np.isnan(acceleration[0])
+    assert velocity[1] == pytest.approx(10.0)
+    assert np.isnan(acceleration[1])
+    # 最近区间每小时(60-20)/2=20，上一个区间每小时10，两个区间中点相隔1.5小时
+    assert velocity[2] == pytest.approx(20.0)
+    assert acceleration[2] == pytest.approx((20.0 - 10.0) / 1.5)
+    assert np.isnan(velocity[3]) and np.isnan(acceleration[3])
+
+def test_kinematics_uses_latest_snapshots(store):
+    for hours, score in enumerate([0, 10, 30, 60]):
+        snapshot(store, hours, {"a": (score, 0)})
+    result = store.kinematics(["a"])
+    assert result["velocity"][0] == pytest.approx(30.0)
+    assert result["acceleration"][0] == pytest.approx(10.0)
+
+def test_empty_store(store):
+    assert len(store) == 0
+    result = store.kinematics(["a"])
+    assert np.isnan(result["velocity"][0])
+    store.compact(T0)
+    assert not os.path.exists(store.path)
+
+def test_compact_round_trip(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.bin"), retention_days=2, max_per_post=3)
+    # a每天一次快照共5天；b只有最近一次
+    for day in range(5):
+        snapshot(store, day * 24, {"a": (day * 10, day)})
+    snapshot(store, 4 * 24, {"b": (7, 3)})
+    before = store.load().copy()
+
+    store.compact(T0 + datetime.timedelta(days=4))
+    after = store.load()
+    assert os.path.getsize(store.path) == len(after) * 20
+
+    # 保留2天内的快照：a在第2、3、4天的三次和b的一次
+    cutoff = int((T0 + datetime.timedelta(days=2) - datetime.datetime(1970, 1, 1)).total_seconds())
+    expected = before[before["ts"] >= cutoff]
+    assert after.tolist() == expected.tolist()
+    assert len(after) == 4
+
+    # 重新打开文件读到相同的记录
+    reopened = SnapshotStore(store.path).load()
+    assert reopened.tolist() == after.tolist()
+    assert SnapshotStore(store.path).kinematics(["a"])["velocity"][0] == pytest.approx(11 / 24)
+
+def test_compact_caps_snapshots_per_post(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.bin"), retention_days=30, max_per_post=2)
+    for hours in range(5):
+        snapshot(store, hours, {"a": (hours, 0), "b": (hours * 2, 0)})
+    store.compact(T0 + datetime.timedelta(hours=5))
+    data = store.load()
+    assert len(data) == 4
+    assert sorted(data[data["key"] == post_key("a")]["score"].tolist()) == [3, 4]
+    assert sorted(data[data["key"] == post_key("b")]["score"].tolist()) == [6, 8]
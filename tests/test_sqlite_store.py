@@ -0,0 +1,29 @@
+import pytest
+from llm_cache import LLMCache
+from post_store import PostStore
+from summary_store import SummaryStore
+from translation_cache import TranslationCache
+
+@pytest.mark.parametrize("store_class", [PostStore, TranslationCache, LLMCache, SummaryStore])
+def test_stores_share_connection_setup(tmp_path, store_class):
+    path = str(tmp_path / "nested" / "store.db")
+    store = store_class(path)
+    assert store.db_path == path
+    assert store._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert store.logger.name == store_class.__module__
+    store.close()
+    # 重新打开已有的数据库时建表语句不报错
+    store_class(path).close()
+
+def test_summary_store_overwrites_and_loads_range(tmp_path):
+    store = SummaryStore(str(tmp_path / "summary.db"))
+    store.save("2026-10-16", "python", "old", 3)
+    store.save("2026-10-16", "python", "new", 4)
+    store.save("2026-10-17", "rust", "rust summary", 2)
+    store.save("2026-10-17", "go", "go summary", 1)
+    store.save("2026-10-20", "python", "later", 5)
+    assert store.load_range("2026-10-16", "2026-10-17") == [
+        {"date": "2026-10-16", "subreddit": "python", "summary": "new", "post_count": 4},
+        {"date": "2026-10-17", "subreddit": "go", "summary": "go summary", "post_count": 1},
+        {"date": "2026-10-17", "subreddit": "rust", "summary": "rust summary", "post_count": 2},
+    ]
@@ -0,0 +1,48 @@
+import itertools
+import pytest
+import translation_cache
+from translation_cache import TranslationCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """每次调用前进1秒，使最近使用时间有确定的先后"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(translation_cache.time, "time", lambda: float(next(ticks)))
+
+def test_hit_and_miss_counts(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"))
+    assert cache.get("en", "zh", "hello") is None
+    cache.put("en", "zh", "hello", "你好")
+    assert cache.get("en", "zh", "hello") == "你好"
+    # 语言对是键的一部分
+    assert cache.get("en", "ja", "hello") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": pytest.approx(1 / 3), "size": 1}
+
+def test_overwrite_does_not_grow(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"))
+    cache.put("en", "zh", "hello", "你好")
+    cache.put("en", "zh", "hello", "您好")
+    assert cache.get("en", "zh", "hello") == "您好"
+    assert cache.stats()["size"] == 1
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = TranslationCache(str(tmp_path / "cache.db"), max_entries=10)
+    for i in range(10):
+        cache.put("en", "zh", f"text {i}", f"译文 {i}")
+    # 读取使text 0成为最近使用
+    assert cache.get("en", "zh", "text 0") == "译文 0"
+    cache.put("en", "zh", "text 10", "译文 10")
+    # 超过上限后淘汰到上限的90%
+    assert cache.stats()["size"] == 9
+    assert cache.get("en", "zh", "text 0") == "译文 0"
+    assert cache.get("en", "zh", "text 1") is None
+    assert cache.get("en", "zh", "text 10") == "译文 10"
+
+def test_size_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = TranslationCache(path)
+    cache.put("en", "zh", "hello", "你好")
+    cache.close()
+    reopened = TranslationCache(path)
+    assert reopened.stats()["size"] == 1
+    assert reopened.get("en", "zh", "hello") == "你好"
@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("alibabacloud_alimt20181012")
+
+from translation_backend import BATCH_MAX_ITEM_CHARS
+from translation_cache import TranslationCache
+from translation_utils import TranslationUtils, split_text
+
+class UpperBackend:
+    """把文本转为大写的假翻译后端"""
+
+    def translate(self, text, source_language, target_language):
+        return text.upper()
+
+    def translate_batch(self, texts, source_language, target_language):
+        return {i: text.upper() for i, text in enumerate(texts)}
+
+def assert_round_trip(text, limit):
+    chunks = split_text(text, limit)
+    assert "".join(chunk + sep for chunk, sep in chunks) == text
+    assert all(len(chunk) <= limit for chunk, _ in chunks)
+    return chunks
+
+def test_split_short_text_is_single_chunk():
+    assert split_text("short text", 100) == [("short text", "")]
+
+def test_split_prefers_paragraph_boundaries():
+    paragraphs = ["word " * 30 + "end." for _ in range(5)]
+    text = "\n\n".join(paragraphs)
+    chunks = assert_round_trip(text, 200)
+    assert [chunk for chunk, _ in chunks] == paragraphs
+
+def test_split_falls_back_to_sentences():
+    text = " ".join(f"Sentence number {i} is here." for i in range(100))
+    chunks = assert_round_trip(text, 120)
+    assert all(chunk.endswith(".") for chunk, _ in chunks)
+
+def test_split_text_without_sentence_breaks():
+    # 没有段落和句末标点，只能按空白切分
+    assert len(assert_round_trip("word " * 1000, BATCH_MAX_ITEM_CHARS)) > 1
+    # 连空白都没有时按长度硬切
+    chunks = assert_round_trip("x" * 2500, BATCH_MAX_ITEM_CHARS)
+    assert [len(chunk) for chunk, _ in chunks] == [1000, 1000, 500]
+
+def test_split_keeps_trailing_separators():
+    assert_round_trip("first paragraph.\n\n" + "a" * 150 + "\n\n\n", 100)
+
+@pytest.fixture
+def translator(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRANSLATION_ENABLED", "true")
+    monkeypatch.setenv("TRANSLATION_MAX_WORKERS", "2")
+    monkeypatch.setenv("TRANSLATION_QPS", "1000")
+    utils = TranslationUtils("id", "secret", cache=TranslationCache(str(tmp_path / "cache.db")),
+                             backend=UpperBackend())
+    yield utils
+    utils.close()
+
+def test_submit_long_texts_does_not_deadlock(translator):
+    # 长文本数量超过工作线程数，每条都需要在线程池内再切片翻译
+    texts = [f"paragraph {i}. " * (BATCH_MAX_ITEM_CHARS // 10) for i in range(translator.max_workers * 2)]
+    futures = [translator.submit(text) for text in texts]
+    assert [future.result(timeout=10) for future in futures] == [text.upper() for text in texts]
+
+def test_translate_many_uses_cache(translator):
+    assert translator.translate_many(["hello", "world", "hello"]) == ["HELLO", "WORLD", "HELLO"]
+    assert translator.translate("hello") == "HELLO"
@@ -0,0 +1,255 @@
+from alibabacloud_alimt20181012.client import Client as alimt20181012Client
+from alibabacloud_tea_openapi import models as open_api_models
+from alibabacloud_alimt20181012 import models as alimt_20181012_models
+from alibabacloud_tea_util import models as util_models
+import argparse
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+# 批量翻译接口(GetBatchTranslate)的限制：每次最多50条，总长度不超过8000字符，单条不超过1000字符
+BATCH_MAX_ITEMS = 50
+BATCH_MAX_CHARS = 8000
+BATCH_MAX_ITEM_CHARS = 1000
+
+
+class AlibabaBackend:
+    """阿里云机器翻译接口
+
+    每个工作线程复用一个长连接客户端。translate和translate_batch失败时抛出异常，
+    重试和回退由TranslationUtils负责。
+    """
+
+    def __init__(self, access_key_id: str, access_key_secret: str, endpoint: str = 'mt.cn-hangzhou.aliyuncs.com'):
+        self.access_key_id = access_key_id
+        self.access_key_secret = access_key_secret
+        self.endpoint = endpoint
+        self._local = threading.local()
+
+    def create_client(self) -> alimt20181012Client:
+        """创建翻译客户端"""
+        config = open_api_models.Config(
+            access_key_id=self.access_key_id,
+            access_key_secret=self.access_key_secret
+        )
+        config.endpoint = self.endpoint
+        return alimt20181012Client(config)
+
+    @property
+    def client(self) -> alimt20181012Client:
+        """当前线程的翻译客户端，首次使用时创建，之后复用"""
+        if getattr(self._local, "client", None) is None:
+            self._local.client = self.create_client()
+        return self._local.client
+
+    def translate(self, text: str, source_language: str, target_language: str) -> str:
+        """调用通用翻译接口翻译单条文本"""
+        request = alimt_20181012_models.TranslateGeneralRequest(
+            format_type='text',
+            source_language=source_language,
+            target_language=target_language,
+            source_text=text,
+            scene='general'
+        )
+        resp = self.client.translate_general_with_options(request, util_models.RuntimeOptions())
+        return resp.body.data.translated
+
+    def translate_batch(self, texts: List[str], source_language: str, target_language: str) -> Dict[int, str]:
+        """调用批量翻译接口，返回 序号->译文(失败的条目不在结果中)"""
+        request = alimt_20181012_models.GetBatchTranslateRequest(
+            format_type='text',
+            source_language=source_language,
+            target_language=target_language,
+            source_text=json.dumps({str(i): text for i, text in enumerate(texts)}, ensure_ascii=False),
+            scene='general',
+            api_type='translate_standard'
+        )
+        resp = self.client.get_batch_translate_with_options(request, util_models.RuntimeOptions())
+        return _parse_translated_list(resp.body.translated_list)
+
+
+class LocalBackend:
+    """调用本地模拟翻译服务(LocalTranslationServer)，用于基准测试和离线调试"""
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, path: str, payload: Dict) -> Dict:
+        request = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{e.code} {e.read().decode('utf-8', 'replace')}") from e
+
+    def translate(self, text: str, source_language: str, target_language: str) -> str:
+        return self._post("/translate", {
+            "source_language": source_language,
+            "target_language": target_language,
+            "source_text": text
+        })["translated"]
+
+    def translate_batch(self, texts: List[str], source_language: str, target_language: str) -> Dict[int, str]:
+        data = self._post("/batch_translate", {
+            "source_language": source_language,
+            "target_language": target_language,
+            "source_text": {str(i): text for i, text in enumerate(texts)}
+        })
+        return _parse_translated_list(data.get("translated_list"))
+
+
+def _parse_translated_list(translated_list) -> Dict[int, str]:
+    results = {}
+    for item in translated_list or []:
+        if str(item.get('code', '200')) == '200' and item.get('translated') is not None:
+            results[int(item['index'])] = item['translated']
+    return results
+
+
+class LocalTranslationServer:
+    """模拟阿里云翻译接口的本地HTTP服务
+
+    译文为"[目标语言] 原文"。每次请求按latency模拟网络和处理延迟；
+    按批量接口的条数和长度限制校验请求；每秒请求数超过qps时返回429限流错误。
+
+    Args:
+        latency: 每次请求的模拟延迟(秒)
+        qps: 每秒允许的请求数，0表示不限流
+        host: 监听地址
+        port: 监听端口，0表示自动分配
+    """
+
+    def __init__(self, latency: float = 0.05, qps: int = 50, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.qps = qps
+        self.calls = 0
+        self.batch_calls = 0
+        self.strings = 0
+        self.throttled = 0
+        self.rejected = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """在后台线程启动服务，返回服务地址"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self.logger.info(f"本地翻译服务已启动: {self.url}")
+        return self.url
+
+    def serve_forever(self):
+        """在当前线程运行服务"""
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = self.batch_calls = self.strings = self.throttled = self.rejected = 0
+
+    def _admit(self) -> bool:
+        """记录一次请求，超过每秒配额时返回False"""
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 1:
+                self._recent.popleft()
+            if self.qps and len(self._recent) >= self.qps:
+                self.throttled += 1
+                return False
+            self._recent.append(now)
+            return True
+
+    def _handle(self, path: str, payload: Dict):
+        """处理一次请求，返回(状态码, 响应内容)"""
+        if not self._admit():
+            return 429, {"Code": "Throttling.User", "Message": "Request was denied due to user flow control."}
+        time.sleep(self.latency)
+        prefix = f"[{payload.get('target_language', 'zh')}] "
+        if path == "/translate":
+            with self._lock:
+                self.calls += 1
+                self.strings += 1
+            return 200, {"translated": prefix + payload["source_text"]}
+        if path == "/batch_translate":
+            texts = payload["source_text"]
+            if (len(texts) > BATCH_MAX_ITEMS or sum(len(t) for t in texts.values()) > BATCH_MAX_CHARS
+                    or any(len(t) > BATCH_MAX_ITEM_CHARS for t in texts.values())):
+                with self._lock:
+                    self.rejected += 1
+                return 400, {"Code": "InvalidParameter", "Message": "Batch size exceeds the limit."}
+            with self._lock:
+                self.calls += 1
+                self.batch_calls += 1
+                self.strings += len(texts)
+            return 200, {"translated_list": [
+                {"index": index, "translated": prefix + text, "code": "200"} for index, text in texts.items()
+            ]}
+        return 404, {"Code": "NotFound"}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length).decode("utf-8"))
+                status, body = server._handle(self.path, payload)
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def create_backend(name: str, access_key_id: str = None, access_key_secret: str = None, local_url: str = None):
+    """根据名称创建翻译后端
+
+    Args:
+        name: alibaba(阿里云机器翻译)或local(本地模拟服务)
+        access_key_id: 阿里云访问密钥ID
+        access_key_secret: 阿里云访问密钥
+        local_url: 本地模拟服务地址
+    """
+    if name == "local":
+        return LocalBackend(local_url or "http://127.0.0.1:8765")
+    return AlibabaBackend(access_key_id, access_key_secret)
+
+
+if __name__ == "__main__":
+    # 单独启动本地模拟服务，配合 TRANSLATION_BACKEND=local 离线运行整个流水线
+    parser = argparse.ArgumentParser(description="本地模拟翻译服务")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--latency", type=float, default=0.05, help="每次请求的模拟延迟(秒)")
+    parser.add_argument("--qps", type=int, default=50, help="每秒允许的请求数，0表示不限流")
+    args = parser.parse_args()
+    server = LocalTranslationServer(latency=args.latency, qps=args.qps, port=args.port)
+    print(f"本地翻译服务: {server.url}")
+    server.serve_forever()
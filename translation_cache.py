@@ -0,0 +1,86 @@
+import hashlib
+import os
+import time
+from typing import Dict, Optional
+from sqlite_store import SQLiteStore
+
+class TranslationCache(SQLiteStore):
+    """持久化的翻译缓存
+
+    以(源语言, 目标语言, 原文)的哈希为键保存译文，跨表格、跨阶段、跨天复用。
+    条目数超过上限时按最近使用时间淘汰(LRU)，并记录命中/未命中次数。
+
+    Args:
+        db_path: SQLite数据库路径
+        max_entries: 最多保存的条目数
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS translations (
+            key TEXT PRIMARY KEY,
+            translated TEXT,
+            last_used REAL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_last_used ON translations (last_used)",
+    )
+
+    def __init__(self, db_path: str = os.path.join("reports", "translation_cache.db"), max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        super().__init__(db_path)
+
+    def _init_schema(self):
+        super()._init_schema()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    @staticmethod
+    def make_key(source_language: str, target_language: str, text: str) -> str:
+        return hashlib.sha256(f"{source_language}\n{target_language}\n{text}".encode("utf-8")).hexdigest()
+
+    def get(self, source_language: str, target_language: str, text: str) -> Optional[str]:
+        """查找译文，未命中时返回None"""
+        key = self.make_key(source_language, target_language, text)
+        with self._lock:
+            row = self._conn.execute("SELECT translated FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE translations SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, source_language: str, target_language: str, text: str, translated: str):
+        """保存译文，超过上限时淘汰最久未使用的条目"""
+        key = self.make_key(source_language, target_language, text)
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM translations WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, translated, last_used) VALUES (?, ?, ?)",
+                (key, translated, time.time())
+            )
+            if exists is None:
+                self._size += 1
+            if self._size > self.max_entries:
+                # 一次淘汰到上限的90%，避免每次写入都触发淘汰
+                evict = self._size - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    """DELETE FROM translations WHERE key IN (
+                        SELECT key FROM translations ORDER BY last_used LIMIT ?)""",
+                    (evict,)
+                )
+                self._size -= evict
+                self.logger.info(f"翻译缓存淘汰了 {evict} 条最久未使用的记录")
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """返回命中次数、未命中次数、命中率和当前条目数"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": self._size
+            }
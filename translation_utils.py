@@ -1,13 +1,57 @@
-from alibabacloud_alimt20181012.client import Client as alimt20181012Client
-from alibabacloud_tea_openapi import models as open_api_models
-from alibabacloud_alimt20181012 import models as alimt_20181012_models
-from alibabacloud_tea_util import models as util_models
 import logging
 import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Tuple
 from dotenv import load_dotenv
+from rate_limiter import TokenBucket
+from translation_backend import BATCH_MAX_CHARS, BATCH_MAX_ITEM_CHARS, BATCH_MAX_ITEMS, create_backend
+from translation_cache import TranslationCache
+
+# 长文本依次尝试的切分位置：段落、换行、句末、空白
+SPLIT_PATTERNS = (r'\n\s*\n', r'\n', r'(?<=[.!?。！？])\s+', r'\s+')
+
+def split_text(text: str, limit: int, level: int = 0) -> List[Tuple[str, str]]:
+    """把长文本切分为不超过limit字符的片段
+
+    优先在段落边界切分，段落过长时退到句子边界，最后才按空白或字符硬切。
+    返回(片段, 其后的分隔符)列表，按顺序拼接即得到原文。
+    """
+    if len(text) <= limit:
+        return [(text, "")]
+    if level >= len(SPLIT_PATTERNS):
+        return [(text[i:i + limit], "") for i in range(0, len(text), limit)]
+
+    parts = re.split(f"({SPLIT_PATTERNS[level]})", text)
+    pieces = []
+    for i in range(0, len(parts), 2):
+        sep = parts[i + 1] if i + 1 < len(parts) else ""
+        if len(parts[i]) > limit:
+            sub = split_text(parts[i], limit, level + 1)
+            sub[-1] = (sub[-1][0], sub[-1][1] + sep)
+            pieces.extend(sub)
+        else:
+            pieces.append((parts[i], sep))
+
+    # 相邻的小片段合并，尽量少切
+    chunks = []
+    current, current_sep = pieces[0]
+    for piece, sep in pieces[1:]:
+        if not piece:
+            current_sep += sep
+        elif len(current) + len(current_sep) + len(piece) <= limit:
+            current += current_sep + piece
+            current_sep = sep
+        else:
+            chunks.append((current, current_sep))
+            current, current_sep = piece, sep
+    chunks.append((current, current_sep))
+    return chunks
 
 class TranslationUtils:
-    def __init__(self, access_key_id: str, access_key_secret: str):
+    def __init__(self, access_key_id: str, access_key_secret: str, cache: TranslationCache = None, backend=None):
         self.access_key_id = access_key_id
         self.access_key_secret = access_key_secret
         self.logger = logging.getLogger(__name__)
@@ -16,14 +60,70 @@ class TranslationUtils:
         # 读取翻译开关配置，默认为开启
         self.translation_enabled = os.getenv('TRANSLATION_ENABLED', 'true').lower() == 'true'
         self.logger.info(f"Translation enabled: {self.translation_enabled}")
-
-    def create_client(self) -> alimt20181012Client:
-        config = open_api_models.Config(
-            access_key_id=self.access_key_id,
-            access_key_secret=self.access_key_secret
+        self.source_language = 'en'
+        self.target_language = 'zh'
+        # 持久化翻译缓存，相同原文跨表格、跨阶段、跨天只翻译一次
+        self.cache = cache or TranslationCache(
+            os.getenv('TRANSLATION_CACHE_PATH', os.path.join('reports', 'translation_cache.db')),
+            max_entries=int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', '100000'))
         )
-        config.endpoint = 'mt.cn-hangzhou.aliyuncs.com'
-        return alimt20181012Client(config)
+        # 翻译后端：alibaba为阿里云机器翻译，local为本地模拟服务(基准测试/离线调试)
+        self.backend = backend or create_backend(
+            os.getenv('TRANSLATION_BACKEND', 'alibaba'),
+            access_key_id, access_key_secret,
+            local_url=os.getenv('TRANSLATION_LOCAL_URL')
+        )
+        # 所有工作线程共享同一份QPS配额，0表示不限流
+        self.max_workers = int(os.getenv('TRANSLATION_MAX_WORKERS', '4'))
+        qps = float(os.getenv('TRANSLATION_QPS', '10'))
+        self.bucket = TokenBucket(rate=qps, capacity=max(1, int(qps)))
+        self.max_retries = int(os.getenv('TRANSLATION_MAX_RETRIES', '2'))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # 标记当前线程是否为本实例线程池的工作线程
+        self._local = threading.local()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """翻译线程池，首次使用时创建"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="translate")
+            return self._executor
+
+    def _run_in_pool(self, func, *args):
+        self._local.in_pool = True
+        try:
+            return func(*args)
+        finally:
+            self._local.in_pool = False
+
+    def _submit(self, func, *args) -> Future:
+        """提交到线程池执行
+
+        已经在线程池的工作线程中时(例如submit()提交的长文本再切片翻译)直接同步执行，
+        避免所有工作线程都在等待排在自己之后的任务而死锁。
+        """
+        if getattr(self._local, "in_pool", False):
+            future = Future()
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self.executor.submit(self._run_in_pool, func, *args)
+
+    def submit(self, text: str) -> Future:
+        """提交一条文本到线程池翻译，返回Future"""
+        return self._submit(self.translate, text)
+
+    def close(self):
+        """关闭线程池"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
 
     def translate(self, text: str) -> str:
         """执行翻译"""
@@ -31,21 +131,120 @@ class TranslationUtils:
         if not self.translation_enabled:
             self.logger.info("Translation is disabled, returning original text")
             return text
-            
-        client = self.create_client()
-        translate_general_request = alimt_20181012_models.TranslateGeneralRequest(
-            format_type='text',
-            source_language='en',
-            target_language='zh',
-            source_text=text,
-            scene='general'
-        )
-        runtime = util_models.RuntimeOptions()
+        if not text or not text.strip():
+            return text
+
+        if len(text) > BATCH_MAX_ITEM_CHARS:
+            return self.translate_many([text])[0]
+        cached = self.cache.get(self.source_language, self.target_language, text)
+        if cached is not None:
+            return cached
+        return self._translate_one(text)
+
+    def _translate_one(self, text: str) -> str:
+        """翻译单条文本并写入缓存，失败时按退避重试，重试用尽后返回原文"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                translated = self._request_translation(text)
+                self.cache.put(self.source_language, self.target_language, text, translated)
+                return translated
+            except Exception as e:
+                self.logger.error(f"Translation error (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(2 ** attempt)
+        print(f"Translation failed, keeping original text: {text[:50]}")
+        return text
+
+    def _request_translation(self, text: str) -> str:
+        """调用通用翻译接口翻译单条文本，失败时抛出异常"""
         self.logger.info(f"Translating text: {text}")
-        try:
-            resp = client.translate_general_with_options(translate_general_request, runtime)
-            return resp.body.data.translated
-        except Exception as e:
-            self.logger.error(f"Translation error: {e}")
-            print(f"Translation error: {e}")
-            return text
\ No newline at end of file
+        self.bucket.acquire()
+        return self.backend.translate(text, self.source_language, self.target_language)
+
+    def _translate_batch(self, texts: List[str]) -> Dict[int, str]:
+        """调用批量翻译接口，返回 序号->译文"""
+        self.bucket.acquire()
+        return self.backend.translate_batch(texts, self.source_language, self.target_language)
+
+    def _make_batches(self, texts: List[str]) -> List[List[str]]:
+        """按接口的条数和长度限制分组"""
+        batches = []
+        batch = []
+        chars = 0
+        for text in texts:
+            if batch and (len(batch) >= BATCH_MAX_ITEMS or chars + len(text) > BATCH_MAX_CHARS):
+                batches.append(batch)
+                batch = []
+                chars = 0
+            batch.append(text)
+            chars += len(text)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def translate_many(self, texts: List[str]) -> List[str]:
+        """批量翻译，按输入顺序返回译文
+
+        先查缓存并去重，剩余文本按批量接口的限制分组，尽量减少远程调用次数。
+        超过单条长度限制的文本在段落/句子边界切成小片段，和其他文本一起批量翻译后按顺序拼回。
+        所有远程调用都提交到线程池并发执行(在线程池内调用时同步执行)；批量调用失败的文本(或片段)单独重试，
+        已成功的部分不会重复翻译。
+        """
+        if not self.translation_enabled:
+            return list(texts)
+
+        translations = {}
+        chunked = {}
+        pending = []
+        for text in dict.fromkeys(texts):
+            if not text or not text.strip():
+                translations[text] = text
+            elif len(text) > BATCH_MAX_ITEM_CHARS:
+                chunked[text] = split_text(text, BATCH_MAX_ITEM_CHARS)
+                self.logger.info(f"长文本({len(text)}字符)切分为 {len(chunked[text])} 个片段")
+            else:
+                pending.append(text)
+        pending.extend(chunk for chunks in chunked.values() for chunk, _ in chunks)
+
+        units = {}
+        misses = []
+        for unit in dict.fromkeys(pending):
+            if not unit.strip():
+                units[unit] = unit
+                continue
+            cached = self.cache.get(self.source_language, self.target_language, unit)
+            if cached is not None:
+                units[unit] = cached
+            else:
+                misses.append(unit)
+
+        # 各批次并发提交到线程池，请求速度由令牌桶限制
+        batch_futures = [(batch, self._submit(self._translate_batch, batch))
+                         for batch in self._make_batches(misses)]
+        retry_futures = []
+        for batch, future in batch_futures:
+            self.logger.info(f"批量翻译 {len(batch)} 条文本")
+            try:
+                results = future.result()
+            except Exception as e:
+                self.logger.error(f"Batch translation error: {e}")
+                results = {}
+            for i, unit in enumerate(batch):
+                if i in results:
+                    units[unit] = results[i]
+                    self.cache.put(self.source_language, self.target_language, unit, results[i])
+                else:
+                    retry_futures.append((unit, self._submit(self._translate_one, unit)))
+        for unit, future in retry_futures:
+            units[unit] = future.result()
+
+        for text in texts:
+            if text in chunked:
+                translations[text] = "".join(units[chunk] + sep for chunk, sep in chunked[text])
+            elif text not in translations:
+                translations[text] = units[text]
+        return [translations[text] for text in texts]
+
+    def cache_stats(self):
+        """翻译缓存的命中统计"""
+        return self.cache.stats()